@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import argparse
+import json
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from . import thread_config
+from .inference import OCR_MP_START, OCR_WORKERS
+from .reader_registry import OCR_BACKEND
+
+def _init(intra_op: int, inter_op: int, langs: tuple[str, ...]) -> None:
+    thread_config.apply(intra_op, inter_op)
+    from .ocr_metrics import _get_easyocr_reader
+    _get_easyocr_reader(langs)
+
+def _ocr(path: str, handwriting: bool, langs: tuple[str, ...]) -> float:
+    from .ocr_metrics import run_easyocr_single
+    _, latency_ms = run_easyocr_single(path, langs=langs, handwriting=handwriting)
+    return latency_ms
+
+def _candidates(processes: int) -> list[tuple[int, int]]:
+    budget = max(1, thread_config.cpu_count() // processes)
+    intra = sorted({budget} | {n for n in (1, 2, 4, 8, 16) if n <= budget})
+    return [(i, j) for i in intra for j in (1, 2)]
+
+def measure(
+    items: list[tuple[str, bool]],
+    workers: int,
+    intra_op: int,
+    inter_op: int,
+    langs: tuple[str, ...],
+    rounds: int,
+) -> dict:
+    ctx = multiprocessing.get_context(OCR_MP_START)
+    with ProcessPoolExecutor(workers, mp_context=ctx, initializer=_init, initargs=(intra_op, inter_op, langs)) as ex:
+        list(ex.map(_ocr, *zip(*items[:workers]), [langs] * workers))
+        work = items * rounds
+        t0 = time.perf_counter()
+        latencies = list(ex.map(_ocr, [p for p, _ in work], [h for _, h in work], [langs] * len(work)))
+        elapsed = time.perf_counter() - t0
+    return {
+        "intra_op":        intra_op,
+        "inter_op":        inter_op,
+        "images_per_s":    round(len(work) / elapsed, 3),
+        "mean_latency_ms": round(sum(latencies) / len(latencies), 1),
+    }
+
+def autotune(
+    items: list[tuple[str, bool]],
+    worker_counts: list[int],
+    langs: tuple[str, ...] = ("es", "en"),
+    rounds: int = 1,
+) -> dict:
+    by_workers = {}
+    for workers in worker_counts:
+        trials = []
+        for intra_op, inter_op in _candidates(workers):
+            trial = measure(items, workers, intra_op, inter_op, langs, rounds)
+            print(f"  workers={workers}  intra={intra_op:<2}  inter={inter_op}  "
+                  f"{trial['images_per_s']:.2f} img/s  {trial['mean_latency_ms']:.0f} ms")
+            trials.append(trial)
+        best = max(trials, key=lambda t: t["images_per_s"])
+        print(f"  -> workers={workers}: intra={best['intra_op']} inter={best['inter_op']}")
+        by_workers[str(workers)] = best
+    return {
+        "cpu_count":  thread_config.cpu_count(),
+        "backend":    OCR_BACKEND,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "by_workers": by_workers,
+    }
+
+def _parse_args():
+    p = argparse.ArgumentParser(description="Autotune de threads de PyTorch por worker de EasyOCR")
+    p.add_argument("--dataset",  default="test_images/ground_truth.json",
+                   help="Ruta al ground_truth.json")
+    p.add_argument("--base-dir", default="test_images",
+                   help="Directorio base de las imágenes")
+    p.add_argument("--workers",  nargs="+", type=int, default=None,
+                   help="Procesos OCR totales a evaluar (default: 1, 2, 4 ... hasta OCR_WORKERS x WEB_CONCURRENCY)")
+    p.add_argument("--max-images", type=int, default=8,
+                   help="Imágenes del dataset a usar en cada prueba")
+    p.add_argument("--rounds",   type=int, default=2,
+                   help="Veces que se procesa el conjunto por prueba")
+    p.add_argument("--output",   default=str(thread_config.OCR_THREADS_CONFIG),
+                   help="Archivo JSON de configuración a escribir")
+    return p.parse_args()
+
+if __name__ == "__main__":
+    args = _parse_args()
+
+    gt_path  = Path(args.dataset)
+    base_dir = Path(args.base_dir)
+    if not gt_path.exists():
+        print(f"[ERROR] No se encontró el archivo: {gt_path}")
+        print("Genera las imágenes primero con:  python -m app.generate_test_images")
+        sys.exit(1)
+
+    with open(gt_path, encoding="utf-8") as f:
+        ground_truth = json.load(f)
+    items = [
+        (str(base_dir / rel), "handwritten" in rel)
+        for rel in list(ground_truth)[: args.max_images]
+        if (base_dir / rel).exists()
+    ]
+    if not items:
+        print("[ERROR] No hay imágenes disponibles en el dataset.")
+        sys.exit(1)
+
+    # Se mide el total de procesos OCR del host (OCR_WORKERS x WEB_CONCURRENCY), que es
+    # la clave con la que thread_config.resolve busca en la configuración.
+    total = thread_config.total_processes(OCR_WORKERS)
+    worker_counts = args.workers or sorted({n for n in (1, 2, 4, 8) if n <= total} | {total})
+    print(f"Autotune con {len(items)} imágenes, {thread_config.cpu_count()} CPUs, workers={worker_counts}")
+
+    config = autotune(items, worker_counts, rounds=args.rounds)
+    thread_config.save_config(config, Path(args.output))
+    print(f"Configuración guardada en: {args.output}")
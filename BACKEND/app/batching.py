@@ -0,0 +1,101 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from typing import Any, Awaitable, Callable, Hashable, Sequence
+
+logger = logging.getLogger("ocr.batching")
+
+# Desactivado por defecto: con varios procesos EasyOCR suele rendir más procesar en
+# paralelo que agrupar; actívalo solo si el benchmark muestra ganancia.
+OCR_BATCH_MAX     = int(os.getenv("OCR_BATCH_MAX", "1"))
+OCR_BATCH_WAIT_MS = float(os.getenv("OCR_BATCH_WAIT_MS", "10"))
+
+BatchRunner = Callable[[Hashable, list[Any]], Awaitable[Sequence[Any]]]
+
+class MicroBatcher:
+
+    def __init__(
+        self,
+        runner: BatchRunner,
+        max_batch: int = OCR_BATCH_MAX,
+        max_wait_ms: float = OCR_BATCH_WAIT_MS,
+        workers: int = 1,
+    ):
+        self.runner      = runner
+        self.max_batch   = max(1, max_batch)
+        self.max_wait_s  = max(0.0, max_wait_ms) / 1000.0
+        self.workers     = max(1, workers)
+
+        self._pending: dict[Hashable, list[tuple[Any, asyncio.Future]]] = {}
+        self._timers: dict[Hashable, asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._batches = 0
+        self._items = 0
+
+    async def submit(self, key: Hashable, item: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        fut: asyncio.Future = loop.create_future()
+        queue = self._pending.setdefault(key, [])
+        queue.append((item, fut))
+
+        if len(queue) >= self.max_batch * self.workers:
+            self._flush(key)
+        elif key not in self._timers:
+            self._timers[key] = loop.call_later(self.max_wait_s, self._flush, key)
+        return await fut
+
+    def _flush(self, key: Hashable) -> None:
+        timer = self._timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self._pending.pop(key, [])
+        # Un lote por worker: así ningún proceso acumula imágenes mientras otros esperan.
+        size = -(-len(batch) // self.workers)
+        for i in range(0, len(batch), max(1, size)):
+            task = asyncio.ensure_future(self._run(key, batch[i:i + size]))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, key: Hashable, batch: list[tuple[Any, asyncio.Future]]) -> None:
+        items = [item for item, _ in batch]
+        self._batches += 1
+        self._items += len(items)
+        try:
+            results = await self.runner(key, items)
+        except Exception as e:
+            if len(batch) == 1:
+                self._resolve(batch[0][1], exc=e)
+                return
+            logger.warning("Lote de %d imágenes falló (%s); reintentando una por una", len(batch), e)
+            await asyncio.gather(*(self._run_single(key, item, fut) for item, fut in batch))
+            return
+        for (_, fut), result in zip(batch, results):
+            self._resolve(fut, result=result)
+
+    async def _run_single(self, key: Hashable, item: Any, fut: asyncio.Future) -> None:
+        try:
+            result = (await self.runner(key, [item]))[0]
+        except Exception as e:
+            self._resolve(fut, exc=e)
+        else:
+            self._resolve(fut, result=result)
+
+    @staticmethod
+    def _resolve(fut: asyncio.Future, result: Any = None, exc: BaseException | None = None) -> None:
+        if fut.done():
+            return
+        if exc is not None:
+            fut.set_exception(exc)
+        else:
+            fut.set_result(result)
+
+    def stats(self) -> dict:
+        return {
+            "max_batch":   self.max_batch,
+            "max_wait_ms": round(self.max_wait_s * 1000.0, 1),
+            "workers":     self.workers,
+            "batches":     self._batches,
+            "mean_batch":  round(self._items / self._batches, 2) if self._batches else 0.0,
+        }
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import logging
+import threading
+import time
+
+logger = logging.getLogger("ocr.breaker")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+class CircuitOpen(RuntimeError):
+    pass
+
+class CircuitBreaker:
+
+    def __init__(self, name: str, failure_threshold: int = 3, reset_timeout: float = 30.0):
+        self.name              = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout     = reset_timeout
+
+        self._lock = threading.Lock()
+        self._state = CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self._short_circuited = 0
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._current_state()
+
+    def _current_state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._probe_in_flight = False
+            logger.info("Circuito %s semiabierto: se permite una petición de prueba", self.name)
+        return self._state
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self._current_state()
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self._short_circuited += 1
+            return False
+
+    def is_probe(self) -> bool:
+        with self._lock:
+            return self._state == HALF_OPEN
+
+    def release_probe(self) -> None:
+        # La prueba terminó sin resultado (p. ej. cancelada): se permite otra.
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            if self._state != CLOSED:
+                logger.info("Circuito %s cerrado de nuevo", self.name)
+            self._state = CLOSED
+            self._failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self._failures += 1
+            if self._state == HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != OPEN:
+                    logger.warning(
+                        "Circuito %s abierto tras %d fallos; reintento en %.0fs",
+                        self.name, self._failures, self.reset_timeout,
+                    )
+                self._state = OPEN
+                self._opened_at = time.monotonic()
+                self._probe_in_flight = False
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            state = self._current_state()
+            retry_in = None
+            if state == OPEN:
+                retry_in = round(max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at)), 1)
+            return {
+                "state":             state,
+                "failures":          self._failures,
+                "failure_threshold": self.failure_threshold,
+                "short_circuited":   self._short_circuited,
+                "retry_in_s":        retry_in,
+            }
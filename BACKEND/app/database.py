@@ -1,16 +1,228 @@
+import logging
+import os
 from pathlib import Path
-from sqlalchemy import create_engine
+from sqlalchemy import bindparam, create_engine, event, inspect, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import sessionmaker, DeclarativeBase
 
+try:
+    from dotenv import load_dotenv
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+except ImportError:
+    pass
+
+logger = logging.getLogger("ocr.db")
+
 BASE_DIR = Path(__file__).resolve().parent
 DB_PATH = BASE_DIR / "oc_results.db"
-DATABASE_URL = f"sqlite:///{DB_PATH}"
+DATABASE_URL = os.getenv("DATABASE_URL", "").strip() or f"sqlite:///{DB_PATH}"
+IS_SQLITE = make_url(DATABASE_URL).get_backend_name() == "sqlite"
+
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL").strip().upper()
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "65536"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_MMAP_SIZE_MB = int(os.getenv("DB_MMAP_SIZE_MB", "256"))
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1").strip() in {"1", "true", "yes"}
+
+if DB_SYNCHRONOUS not in {"OFF", "NORMAL", "FULL", "EXTRA"}:
+    raise ValueError(f"DB_SYNCHRONOUS inválido: {DB_SYNCHRONOUS}")
+
+def _engine_options() -> dict:
+    if IS_SQLITE:
+        return {"connect_args": {"check_same_thread": False, "timeout": DB_BUSY_TIMEOUT_MS / 1000}}
+    return {
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+engine = create_engine(DATABASE_URL, **_engine_options())
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+def _sqlite_pragmas(dbapi_conn, _record) -> None:
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA journal_mode=WAL")
+    cur.execute(f"PRAGMA synchronous={DB_SYNCHRONOUS}")
+    cur.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+    cur.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    cur.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE_MB * 1024 * 1024}")
+    cur.execute("PRAGMA temp_store=MEMORY")
+    cur.close()
+
+def _ocr_unpack(codec: str | None, data: bytes | None) -> str | None:
+    from .text_store import unpack
+    return unpack(codec, data) if data is not None else None
+
+def _sqlite_functions(dbapi_conn, _record) -> None:
+    dbapi_conn.create_function("ocr_unpack", 2, _ocr_unpack, deterministic=True)
+
+if IS_SQLITE:
+    event.listen(engine, "connect", _sqlite_pragmas)
+    event.listen(engine, "connect", _sqlite_functions)
+
 class Base(DeclarativeBase):
     pass
+
+MIGRATIONS = [
+    ("ocr_results", "doc_type_id", "INTEGER"),
+]
+
+def _add_column(table: str, column: str, ddl: str) -> None:
+    with engine.connect() as conn:
+        if column in {c["name"] for c in inspect(conn).get_columns(table)}:
+            return
+    try:
+        with engine.begin() as conn:
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+        logger.info("Migración: columna %s.%s añadida", table, column)
+    except SQLAlchemyError:
+        with engine.connect() as conn:
+            if column not in {c["name"] for c in inspect(conn).get_columns(table)}:
+                raise
+
+FTS_TABLE = "ocr_results_fts"
+FTS_VIEW = "ocr_results_text"
+TEXT_PACK_BATCH = 500
+
+# El índice es external-content sobre una vista que descomprime ocr_texts con la
+# función ocr_unpack, así que no guarda otra copia del texto. ocr_unpack solo existe
+# en las conexiones de la aplicación: por eso no hay triggers (fallarían en el CLI de
+# sqlite3, backups o scripts) y es la sesión ORM quien mantiene el índice al hacer
+# flush (ver models.py). Tras escribir ocr_results con otras herramientas hay que
+# reconstruirlo con `python -m app.search --rebuild`.
+FTS_DDL = [
+    f"CREATE VIEW IF NOT EXISTS {FTS_VIEW} AS"
+    " SELECT r.id AS id, r.filename AS filename, coalesce(r.text, ocr_unpack(t.codec, t.data)) AS text"
+    " FROM ocr_results r LEFT JOIN ocr_texts t ON t.result_id = r.id",
+    f"CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5("
+    f" filename, text, content='{FTS_VIEW}', content_rowid='id',"
+    " tokenize='unicode61 remove_diacritics 2')",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+FTS_LEGACY_TRIGGERS = (
+    "ocr_results_fts_ai", "ocr_results_fts_ad", "ocr_results_fts_au", "ocr_results_fts_bu",
+    "ocr_results_fts_bd", "ocr_texts_fts_bi", "ocr_texts_fts_ai", "ocr_texts_fts_bu",
+    "ocr_texts_fts_au", "ocr_texts_fts_bd", "ocr_texts_fts_ad",
+)
+
+HAS_FTS = False
+
+def fts_remove(conn, ids: list[int]) -> None:
+    # FTS5 external-content exige borrar con los valores indexados: los de la vista
+    # antes de aplicar el cambio.
+    conn.execute(
+        text(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, filename, text)"
+            f" SELECT 'delete', id, filename, text FROM {FTS_VIEW} WHERE id IN :ids"
+        ).bindparams(bindparam("ids", expanding=True)),
+        {"ids": ids},
+    )
+
+def fts_add(conn, ids: list[int]) -> None:
+    conn.execute(
+        text(
+            f"INSERT INTO {FTS_TABLE}(rowid, filename, text)"
+            f" SELECT id, filename, text FROM {FTS_VIEW} WHERE id IN :ids"
+        ).bindparams(bindparam("ids", expanding=True)),
+        {"ids": ids},
+    )
+
+def rebuild_fts() -> None:
+    with engine.begin() as conn:
+        conn.execute(text(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"))
+
+def _drop_stale_fts() -> None:
+    # Índices de versiones anteriores (sobre ocr_results.text, con copia propia del
+    # texto o mantenidos por triggers que dependían de ocr_unpack).
+    with engine.connect() as conn:
+        sql = conn.execute(
+            text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+        ).scalar()
+    with engine.begin() as conn:
+        for trigger in FTS_LEGACY_TRIGGERS:
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {trigger}"))
+        if sql is not None and f"content='{FTS_VIEW}'" not in sql:
+            conn.execute(text(f"DROP TABLE IF EXISTS {FTS_TABLE}"))
+            logger.info("Migración: índice %s anterior eliminado, se reconstruirá", FTS_TABLE)
+
+def _create_fts() -> bool:
+    with engine.connect() as conn:
+        exists = conn.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": FTS_TABLE}
+        ).first()
+    if exists:
+        return True
+    try:
+        with engine.begin() as conn:
+            for ddl in FTS_DDL:
+                conn.execute(text(ddl))
+        logger.info("Índice de texto completo %s creado", FTS_TABLE)
+        return True
+    except SQLAlchemyError as e:
+        logger.warning("FTS5 no disponible, la búsqueda usará LIKE: %s", e)
+        return False
+
+def _pack_texts() -> None:
+    from .text_store import OCR_TEXT_CODEC, OCR_TEXT_INLINE_MAX, pack
+    if OCR_TEXT_INLINE_MAX <= 0:
+        return
+    moved = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                text(
+                    "SELECT id, text FROM ocr_results WHERE length(text) > :max LIMIT :limit"
+                ),
+                {"max": OCR_TEXT_INLINE_MAX, "limit": TEXT_PACK_BATCH},
+            ).all()
+            if not rows:
+                break
+            conn.execute(
+                Base.metadata.tables["ocr_texts"].insert(),
+                [
+                    {"result_id": r.id, "codec": OCR_TEXT_CODEC, "size": len(r.text), "data": pack(r.text)}
+                    for r in rows
+                ],
+            )
+            conn.execute(
+                text("UPDATE ocr_results SET text = NULL WHERE id = :id"), [{"id": r.id} for r in rows]
+            )
+        moved += len(rows)
+    if moved:
+        logger.info(
+            "Migración: %d textos comprimidos en ocr_texts (ejecuta VACUUM para recuperar espacio)", moved
+        )
+
+def _create_indexes() -> None:
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except SQLAlchemyError as e:
+                logger.warning("No se pudo crear el índice %s: %s", index.name, e)
+
+def run_migrations() -> None:
+    global HAS_FTS
+    Base.metadata.create_all(bind=engine)
+    for table, column, ddl in MIGRATIONS:
+        _add_column(table, column, ddl)
+    _create_indexes()
+    if IS_SQLITE:
+        _drop_stale_fts()
+    _pack_texts()
+    HAS_FTS = IS_SQLITE and _create_fts()
+    # Sin conexiones abiertas: con preload_app los workers de gunicorn nacen por fork
+    # de este proceso y no deben heredar el socket/handle de la base.
+    engine.dispose()
+
 def get_db():
     db = SessionLocal()
     try:
@@ -0,0 +1,168 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from pathlib import Path
+
+import httpx
+
+from .circuit_breaker import CircuitBreaker
+from .preprocessing import ImageInput, encode_jpeg_base64
+from .rate_governor import GROQ_TOKENS_PER_REQUEST, TokenBucketGovernor, groq_governor
+
+try:
+    from dotenv import load_dotenv
+    load_dotenv(Path(__file__).resolve().parent.parent / ".env")
+except ImportError:
+    pass
+
+logger = logging.getLogger("ocr.groq")
+
+GROQ_API_KEY         = os.getenv("GROQ_API_KEY", "").strip()
+GROQ_MODEL           = os.getenv("GROQ_MODEL", "meta-llama/llama-4-scout-17b-16e-instruct").strip()
+GROQ_BASE_URL        = os.getenv("GROQ_BASE_URL", "https://api.groq.com/openai/v1").strip().rstrip("/")
+GROQ_MAX_CONCURRENCY = int(os.getenv("GROQ_MAX_CONCURRENCY", "4"))
+GROQ_TIMEOUT         = float(os.getenv("GROQ_TIMEOUT", "60"))
+GROQ_MAX_BACKOFF     = 60.0
+GROQ_BREAKER_FAILURES = int(os.getenv("GROQ_BREAKER_FAILURES", "3"))
+GROQ_BREAKER_RESET_S  = float(os.getenv("GROQ_BREAKER_RESET_S", "30"))
+
+PROMPT = (
+    "Transcribe exactamente el texto manuscrito de esta imagen. "
+    "Devuelve SOLO el texto tal como aparece, sin explicaciones, "
+    "sin comentarios, sin comillas. Respeta los saltos de línea."
+)
+
+class GroqError(RuntimeError):
+    pass
+
+def _retry_after(resp: httpx.Response, attempt: int) -> float:
+    value = resp.headers.get("Retry-After")
+    try:
+        wait_s = float(value) if value else 2 ** (attempt + 2)
+    except ValueError:
+        wait_s = 2 ** (attempt + 2)
+    return min(wait_s, GROQ_MAX_BACKOFF)
+
+class GroqVisionClient:
+
+    def __init__(
+        self,
+        api_key: str = GROQ_API_KEY,
+        model: str = GROQ_MODEL,
+        base_url: str = GROQ_BASE_URL,
+        max_concurrency: int = GROQ_MAX_CONCURRENCY,
+        timeout: float = GROQ_TIMEOUT,
+        governor: TokenBucketGovernor = groq_governor,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ):
+        self.api_key         = api_key
+        self.model           = model
+        self.base_url        = base_url
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout         = timeout
+        self.governor        = governor
+        self.transport       = transport
+
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._client: httpx.AsyncClient | None = None
+        self._limiter: asyncio.Semaphore | None = None
+
+    @property
+    def configured(self) -> bool:
+        return bool(self.api_key)
+
+    def _bind(self) -> tuple[httpx.AsyncClient, asyncio.Semaphore]:
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._loop is not loop:
+            self._loop = loop
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=self.timeout,
+                transport=self.transport,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+                headers={
+                    "Authorization": f"Bearer {self.api_key}",
+                    "User-Agent":    "MODULAR-OCR/2.0 (https://github.com/chopperx3/modular)",
+                },
+            )
+            self._limiter = asyncio.Semaphore(self.max_concurrency)
+        return self._client, self._limiter
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = self._loop = self._limiter = None
+
+    def _payload(self, b64: str) -> dict:
+        return {
+            "model": self.model,
+            "messages": [{
+                "role": "user",
+                "content": [
+                    {"type": "text", "text": PROMPT},
+                    {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{b64}"}},
+                ],
+            }],
+            "max_tokens": 1024,
+            "temperature": 0.1,
+        }
+
+    async def transcribe(self, image: ImageInput, max_retries: int = 4) -> str:
+        text, _ = await self.transcribe_timed(image, max_retries=max_retries)
+        return text
+
+    async def transcribe_timed(self, image: ImageInput, max_retries: int = 4) -> tuple[str, float]:
+        # Devuelve también el tiempo de ida y vuelta HTTP (ms), sin las esperas de cuota
+        # ni los backoffs entre reintentos.
+        if not self.configured:
+            raise GroqError("GROQ_API_KEY no configurada en .env")
+
+        client, limiter = self._bind()
+        b64 = await asyncio.to_thread(encode_jpeg_base64, image)
+        payload = self._payload(b64)
+        http_s = 0.0
+
+        for attempt in range(max_retries):
+            await self.governor.acquire(GROQ_TOKENS_PER_REQUEST)
+            async with limiter:
+                t0 = time.perf_counter()
+                try:
+                    resp = await client.post("/chat/completions", json=payload)
+                except httpx.HTTPError as e:
+                    resp = None
+                    error = e
+                http_s += time.perf_counter() - t0
+
+            if resp is None:
+                if attempt == max_retries - 1:
+                    raise GroqError(f"Groq API unreachable: {error}") from error
+                await asyncio.sleep(2 ** attempt)
+                continue
+
+            if resp.status_code == 200:
+                data = resp.json()
+                used = (data.get("usage") or {}).get("total_tokens")
+                await asyncio.to_thread(self.governor.settle, GROQ_TOKENS_PER_REQUEST, used)
+                return data["choices"][0]["message"]["content"].strip(), http_s * 1000.0
+
+            if resp.status_code == 429:
+                wait_s = _retry_after(resp, attempt)
+                if attempt < max_retries - 1:
+                    logger.info("Groq rate limit (429). Esperando %.1fs antes de reintentar...", wait_s)
+                    await asyncio.sleep(wait_s)
+                    continue
+                raise GroqError("Groq API rate limit alcanzado tras varios reintentos")
+
+            snippet = resp.text[:200].replace("\n", " ")
+            raise GroqError(f"Groq API error {resp.status_code}: {snippet}")
+
+        raise GroqError("Groq API: agotaron los reintentos")
+
+groq_client = GroqVisionClient()
+groq_breaker = CircuitBreaker("groq", GROQ_BREAKER_FAILURES, GROQ_BREAKER_RESET_S)
@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
+from typing import Any, Callable, Sequence
+
+from . import ocr_engine, thread_config, tiling
+from .batching import MicroBatcher
+from .circuit_breaker import CircuitOpen
+from .groq_client import groq_breaker, groq_client
+from .preprocessing import ImageInput
+from .reader_registry import COUNTERS, counter_stats, reader_registry
+from .region_cache import COUNTERS as REGION_COUNTERS, region_cache
+
+logger = logging.getLogger("ocr.inference")
+
+OCR_WORKERS        = int(os.getenv("OCR_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+OCR_IO_WORKERS     = int(os.getenv("OCR_IO_WORKERS", os.getenv("GROQ_WORKERS", "4")))
+OCR_QUEUE_MAX      = int(os.getenv("OCR_QUEUE_MAX", "16"))
+OCR_RETRY_AFTER    = int(os.getenv("OCR_RETRY_AFTER", "5"))
+OCR_MP_START       = os.getenv("OCR_MP_START", "fork" if sys.platform.startswith("linux") else "spawn").strip()
+OCR_HEDGE          = os.getenv("OCR_HEDGE", "0").strip() in {"1", "true", "yes"}
+OCR_HEDGE_BUDGET_S = float(os.getenv("OCR_HEDGE_BUDGET_S", "2.5"))
+OCR_HEDGE_GRACE_S  = float(os.getenv("OCR_HEDGE_GRACE_S", "0.5"))
+
+class PoolSaturated(RuntimeError):
+
+    def __init__(self, retry_after: int):
+        super().__init__("Cola de inferencia llena")
+        self.retry_after = retry_after
+
+def _init_worker(counters, region_counters, threads: dict) -> None:
+    reader_registry.share_counters(counters)
+    region_cache.share_counters(region_counters)
+    thread_config.apply(threads["intra_op"], threads["inter_op"])
+    try:
+        ocr_engine.preload_readers()
+    except Exception as e:
+        logger.warning("No se pudo precargar EasyOCR en el worker: %s", e)
+
+def _memory(pid: int) -> dict | None:
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            kb = {
+                parts[0].rstrip(":"): int(parts[1])
+                for parts in (line.split() for line in f)
+                if len(parts) >= 3 and parts[0].endswith(":")
+            }
+    except (OSError, ValueError):
+        return None
+    return {
+        "pid":       pid,
+        "rss_mb":    round(kb.get("Rss", 0) / 1024, 1),
+        "pss_mb":    round(kb.get("Pss", 0) / 1024, 1),
+        "shared_mb": round((kb.get("Shared_Clean", 0) + kb.get("Shared_Dirty", 0)) / 1024, 1),
+    }
+
+def _accepted(task: asyncio.Future) -> str | None:
+    if not task.done() or task.cancelled() or task.exception() is not None:
+        return None
+    text = task.result()
+    return text if text.strip() else None
+
+def _ping() -> int:
+    return os.getpid()
+
+class InferencePool:
+
+    def __init__(
+        self,
+        ocr_workers: int = OCR_WORKERS,
+        io_workers: int = OCR_IO_WORKERS,
+        queue_max: int = OCR_QUEUE_MAX,
+        retry_after: int = OCR_RETRY_AFTER,
+    ):
+        self.ocr_workers  = max(1, ocr_workers)
+        self.io_workers = max(1, io_workers)
+        self.queue_max    = max(0, queue_max)
+        self.retry_after  = retry_after
+
+        self._cpu: ProcessPoolExecutor | None = None
+        self._io: ThreadPoolExecutor | None = None
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._in_flight = 0
+        self._rejected = 0
+        self._batcher = MicroBatcher(self._run_easyocr_batch, workers=self.ocr_workers)
+        self._reader_counters = None
+        self._region_counters = None
+        self.threads = thread_config.resolve(self.ocr_workers)
+
+    @property
+    def capacity(self) -> int:
+        return self.ocr_workers + self.queue_max
+
+    @property
+    def started(self) -> bool:
+        return self._cpu is not None and self._io is not None
+
+    def start(self) -> None:
+        # Carga modelos y crea procesos: solo bajo _start_lock, nunca bajo _lock (que usa slot()).
+        with self._start_lock:
+            if self._cpu is None:
+                if OCR_MP_START == "fork":
+                    thread_config.apply(self.threads["intra_op"], self.threads["inter_op"])
+                    loaded = ocr_engine.preload_readers()
+                    logger.info("Modelos EasyOCR precargados antes del fork: %s", loaded)
+                ctx = multiprocessing.get_context(OCR_MP_START)
+                if self._reader_counters is None:
+                    self._reader_counters = ctx.Array("d", len(COUNTERS))
+                    self._region_counters = ctx.Array("d", len(REGION_COUNTERS))
+                    region_cache.share_counters(self._region_counters)
+                self._cpu = ProcessPoolExecutor(
+                    max_workers=self.ocr_workers,
+                    mp_context=ctx,
+                    initializer=_init_worker,
+                    initargs=(self._reader_counters, self._region_counters, self.threads),
+                )
+                for _ in range(self.ocr_workers):
+                    self._cpu.submit(_ping)
+                logger.info(
+                    "Pool de inferencia: %d procesos EasyOCR (%s, torch %d/%d threads, %s), %d threads I/O, cola %d",
+                    self.ocr_workers, OCR_MP_START, self.threads["intra_op"], self.threads["inter_op"],
+                    self.threads["source"], self.io_workers, self.queue_max,
+                )
+            if self._io is None:
+                self._io = ThreadPoolExecutor(max_workers=self.io_workers, thread_name_prefix="ocr-io")
+
+    def shutdown(self) -> None:
+        with self._start_lock:
+            cpu, io = self._cpu, self._io
+            self._cpu = self._io = None
+        if cpu is not None:
+            cpu.shutdown(wait=False, cancel_futures=True)
+        if io is not None:
+            io.shutdown(wait=False, cancel_futures=True)
+
+    async def _executors(self) -> tuple[ProcessPoolExecutor, ThreadPoolExecutor]:
+        if not self.started:
+            await asyncio.to_thread(self.start)
+        return self._cpu, self._io
+
+    @contextmanager
+    def slot(self, weight: int = 1):
+        if weight <= 0:
+            yield
+            return
+        with self._lock:
+            if self._in_flight + weight > self.capacity:
+                self._rejected += 1
+                raise PoolSaturated(self.retry_after)
+            self._in_flight += weight
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= weight
+
+    async def run_cpu(self, fn: Callable[..., Any], *args: Any) -> Any:
+        cpu, _ = await self._executors()
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(cpu, fn, *args)
+        except BrokenProcessPool:
+            logger.error("Pool de procesos EasyOCR roto; se recreará en la siguiente petición")
+            with self._lock:
+                if self._cpu is cpu:
+                    self._cpu = None
+            cpu.shutdown(wait=False, cancel_futures=True)
+            raise
+
+    async def run_io(self, fn: Callable[..., Any], *args: Any) -> Any:
+        _, io = await self._executors()
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(io, fn, *args)
+
+    async def _run_easyocr_batch(self, langs: tuple[str, ...], images: list[ImageInput]) -> list[str]:
+        return await self.run_cpu(ocr_engine._run_easyocr_batch, images, langs)
+
+    async def easyocr(self, image: ImageInput, langs: Sequence[str] | None, doc_type_id: int | None = None) -> str:
+        key = reader_registry.check(langs)
+        if region_cache.enabled and doc_type_id is not None:
+            return await self.run_cpu(ocr_engine._run_easyocr_regions, image, key, doc_type_id)
+        if self._batcher.max_batch <= 1 or tiling.needs_tiling(image):
+            return await self.run_cpu(ocr_engine._run_easyocr, image, key)
+        return await self._batcher.submit(key, image)
+
+    async def groq(self, image: ImageInput) -> str:
+        if not groq_breaker.allow():
+            raise CircuitOpen("Circuito de Groq abierto")
+        try:
+            text = await groq_client.transcribe(image, max_retries=1 if groq_breaker.is_probe() else 4)
+        except Exception:
+            groq_breaker.record_failure()
+            raise
+        except BaseException:
+            groq_breaker.release_probe()
+            raise
+        groq_breaker.record_success()
+        return text
+
+    async def _hedged(
+        self, image: ImageInput, langs: Sequence[str] | None, doc_type_id: int | None,
+    ) -> tuple[str, str]:
+        groq_task = asyncio.ensure_future(self.groq(image))
+        await asyncio.wait({groq_task}, timeout=OCR_HEDGE_BUDGET_S)
+        if (text := _accepted(groq_task)) is not None:
+            return text, "groq"
+
+        easy_task = asyncio.ensure_future(self.easyocr(image, langs, doc_type_id))
+        pending: set[asyncio.Future] = {easy_task} if groq_task.done() else {groq_task, easy_task}
+        try:
+            while pending:
+                _, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                if (text := _accepted(groq_task)) is not None:
+                    return text, "groq"
+                if easy_task.done() and not easy_task.cancelled() and easy_task.exception() is None:
+                    if not groq_task.done():
+                        await asyncio.wait({groq_task}, timeout=OCR_HEDGE_GRACE_S)
+                        if (text := _accepted(groq_task)) is not None:
+                            return text, "groq"
+                    label = "easyocr (fallback)" if groq_task.done() else "easyocr (hedge)"
+                    return easy_task.result(), label
+            return easy_task.result(), "easyocr (fallback)"
+        finally:
+            for t in (groq_task, easy_task):
+                if not t.done():
+                    t.cancel()
+
+    async def run_ocr(
+        self, image: ImageInput, langs: Sequence[str] | None, handwriting: bool, doc_type_id: int | None = None,
+    ) -> tuple[str, str]:
+        if handwriting and OCR_HEDGE:
+            return await self._hedged(image, langs, doc_type_id)
+        if handwriting:
+            try:
+                return await self.groq(image), "groq"
+            except CircuitOpen:
+                return await self.easyocr(image, langs, doc_type_id), "easyocr (fallback)"
+            except Exception as e:
+                logger.warning("Groq Vision falló, usando EasyOCR como fallback: %s", e)
+                return await self.easyocr(image, langs, doc_type_id), "easyocr (fallback)"
+
+        return await self.easyocr(image, langs, doc_type_id), "easyocr"
+
+    def memory(self) -> dict:
+        cpu = self._cpu
+        pids = sorted(getattr(cpu, "_processes", None) or {}) if cpu is not None else []
+        return {
+            "api":     _memory(os.getpid()),
+            "workers": [m for m in (_memory(pid) for pid in pids) if m is not None],
+        }
+
+    def readers(self) -> dict:
+        stats = {"api": reader_registry.stats()}
+        if self._reader_counters is not None:
+            stats["workers"] = counter_stats(self._reader_counters)
+        return stats
+
+    def stats(self) -> dict:
+        return {
+            "ocr_workers":  self.ocr_workers,
+            "io_workers": self.io_workers,
+            "queue_max":    self.queue_max,
+            "in_flight":    self._in_flight,
+            "rejected":     self._rejected,
+            "batching":     self._batcher.stats(),
+            "torch_threads": self.threads,
+            "memory":       self.memory(),
+            "readers":      self.readers(),
+            "regions":      region_cache.stats(),
+        }
+
+pool = InferencePool()
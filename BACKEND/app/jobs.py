@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .inference import PoolSaturated
+from .models import OCRJob, OCRResult
+from .ocr_service import is_handwriting, parse_langs, recognize, store_error, store_result, to_response
+from .schemas import OCRJobResponse
+
+logger = logging.getLogger("ocr.jobs")
+
+OCR_JOB_CONCURRENCY = int(os.getenv("OCR_JOB_CONCURRENCY", "2"))
+OCR_JOB_HEARTBEAT_S = float(os.getenv("OCR_JOB_HEARTBEAT_S", "30"))
+OCR_JOB_STALE_S = float(os.getenv("OCR_JOB_STALE_S", "120"))
+
+QUEUED, RUNNING, DONE, ERROR = "queued", "running", "done", "error"
+
+class JobQueue:
+
+    def __init__(self, concurrency: int = OCR_JOB_CONCURRENCY):
+        self.concurrency = max(1, concurrency)
+        self._queue: asyncio.Queue[str] | None = None
+        self._workers: list[asyncio.Task] = []
+
+    def submit(self, data: bytes, filename: str, lang: str, mode: str, doc_type_id: int | None) -> OCRJob:
+        job = OCRJob(
+            id=uuid.uuid4().hex,
+            status=QUEUED,
+            filename=filename,
+            lang=lang or "es,en",
+            mode=mode or "",
+            doc_type_id=doc_type_id,
+            payload=data,
+        )
+        with SessionLocal() as db:
+            db.add(job); db.commit(); db.refresh(job)
+            db.expunge(job)
+        self._enqueue(job.id)
+        return job
+
+    def _enqueue(self, job_id: str) -> None:
+        if self._queue is None:
+            raise RuntimeError("La cola de trabajos no está iniciada")
+        self._queue.put_nowait(job_id)
+
+    async def start(self) -> None:
+        if self._queue is not None:
+            return
+        self._queue = asyncio.Queue()
+
+        self._requeue_stale()
+        with SessionLocal() as db:
+            pending = db.execute(
+                select(OCRJob.id).where(OCRJob.status == QUEUED).order_by(OCRJob.created_at)
+            ).scalars().all()
+        for job_id in pending:
+            self._queue.put_nowait(job_id)
+        if pending:
+            logger.info("Reencolados %d trabajos OCR pendientes", len(pending))
+
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self._workers.append(asyncio.create_task(self._reaper()))
+
+    def _requeue_stale(self) -> list[str]:
+        # Un trabajo vivo renueva updated_at cada OCR_JOB_HEARTBEAT_S; si deja de hacerlo,
+        # el nodo que lo procesaba cayó y cualquier nodo puede reencolarlo.
+        stale = datetime.utcnow() - timedelta(seconds=OCR_JOB_STALE_S)
+        with SessionLocal() as db:
+            ids = db.execute(
+                update(OCRJob)
+                .where(OCRJob.status == RUNNING, OCRJob.updated_at < stale)
+                .values(status=QUEUED)
+                .returning(OCRJob.id)
+            ).scalars().all()
+            db.commit()
+        if ids:
+            logger.warning("Reencolados %d trabajos OCR sin latido", len(ids))
+        return ids
+
+    async def _reaper(self) -> None:
+        while True:
+            await asyncio.sleep(OCR_JOB_STALE_S / 2)
+            try:
+                for job_id in self._requeue_stale():
+                    self._enqueue(job_id)
+            except Exception as e:
+                logger.warning("No se pudieron revisar los trabajos OCR: %s", e)
+
+    async def _heartbeat(self, job_id: str) -> None:
+        while True:
+            await asyncio.sleep(OCR_JOB_HEARTBEAT_S)
+            try:
+                with SessionLocal() as db:
+                    db.execute(
+                        update(OCRJob)
+                        .where(OCRJob.id == job_id, OCRJob.status == RUNNING)
+                        .values(updated_at=datetime.utcnow())
+                    )
+                    db.commit()
+            except Exception as e:
+                logger.warning("Latido del trabajo %s falló: %s", job_id, e)
+
+    async def stop(self) -> None:
+        for t in self._workers:
+            t.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        self._queue = None
+
+    async def _worker(self) -> None:
+        assert self._queue is not None
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception("Trabajo %s falló: %s", job_id, e)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job_id: str) -> None:
+        with SessionLocal() as db:
+            claimed = db.execute(
+                update(OCRJob)
+                .where(OCRJob.id == job_id, OCRJob.status == QUEUED)
+                .values(status=RUNNING, updated_at=datetime.utcnow())
+            ).rowcount
+            db.commit()
+            if not claimed:
+                return
+            job = db.get(OCRJob, job_id)
+
+            langs = parse_langs(job.lang)
+            handwriting = is_handwriting(job.mode)
+            heartbeat = asyncio.create_task(self._heartbeat(job_id))
+            try:
+                text, engine = await self._recognize(db, job, langs, handwriting)
+            except Exception as e:
+                row = await store_error(db, job.filename, e, job.doc_type_id)
+                job.status, job.error, job.result_id = ERROR, str(e), row.id
+                job.payload = None
+                db.commit()
+                return
+            finally:
+                heartbeat.cancel()
+
+            result = await store_result(db, job.filename, text, engine, job.doc_type_id)
+            job.status, job.engine, job.result_id = DONE, engine, result.id
+            job.payload = None
+            db.commit()
+
+    async def _recognize(self, db: Session, job: OCRJob, langs: list[str], handwriting: bool) -> tuple[str, str]:
+        while True:
+            try:
+                return await recognize(
+                    db, job.payload or b"", langs=langs, handwriting=handwriting, doc_type_id=job.doc_type_id,
+                )
+            except PoolSaturated as e:
+                await asyncio.sleep(e.retry_after)
+
+def job_response(db: Session, job: OCRJob) -> OCRJobResponse:
+    result = None
+    if job.status == DONE and job.result_id is not None:
+        row = db.get(OCRResult, job.result_id)
+        if row is not None:
+            result = to_response(row, job.engine)
+    return OCRJobResponse(
+        id=job.id,
+        status=job.status,
+        filename=job.filename,
+        created_at=job.created_at,
+        updated_at=job.updated_at,
+        error=job.error,
+        result=result,
+    )
+
+job_queue = JobQueue()
@@ -8,7 +8,6 @@ from pathlib import Path
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy import inspect, text
 
 try:
     from dotenv import load_dotenv
@@ -16,21 +15,21 @@ try:
 except ImportError:
     pass
 
-from .database import Base, engine
+from .database import engine, run_migrations
 from .middleware import add_middlewares
 from .models import OCRResult
-from .ocr_engine import get_reader
+from .groq_client import groq_breaker, groq_client
+from .inference import OCR_MP_START, pool
+from .rate_governor import groq_governor
+from .jobs import job_queue
+from .result_cache import result_cache
+from .write_behind import write_behind
 from .routers import ocr, results
+from .routers.ocr import UPLOAD_LIMITS
 from .routers.benchmark import router as benchmark_router
 from .routers.renew import router as renew_router
 
-Base.metadata.create_all(bind=engine)
-with engine.connect() as conn:
-    inspector = inspect(conn)
-    cols = [c["name"] for c in inspector.get_columns("ocr_results")]
-    if "doc_type_id" not in cols:
-        conn.execute(text("ALTER TABLE ocr_results ADD COLUMN doc_type_id INTEGER"))
-        conn.commit()
+run_migrations()
 
 app = FastAPI(
     title="MODULAR OCR API",
@@ -50,12 +49,14 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "Retry-After"],
 )
 
 add_middlewares(
     app,
     rate_limit_max=int(os.getenv("RATE_LIMIT_MAX", "30")),
     rate_limit_window=float(os.getenv("RATE_LIMIT_WINDOW", "60")),
+    upload_limits=UPLOAD_LIMITS,
 )
 
 app.include_router(ocr.router)
@@ -76,8 +77,14 @@ def health():
         "engines": {
             "easyocr": True,
             "tesseract": _tesseract_available(),
-            "groq_vision": bool(os.getenv("GROQ_API_KEY", "").strip()),
+            "groq_vision": groq_client.configured,
         },
+        "inference": pool.stats(),
+        "cache": result_cache.stats(),
+        "groq_governor": groq_governor.stats(),
+        "groq_circuit": groq_breaker.snapshot(),
+        "database": engine.url.get_backend_name(),
+        "db_writes": write_behind.stats(),
     }
 
 def _tesseract_available() -> bool:
@@ -97,14 +104,30 @@ if STATIC_DIR.exists():
 
 def _warmup() -> None:
     try:
-        get_reader(["es", "en"])
-        print("[warmup] EasyOCR OK (es, en)")
+        pool.start()
+        print("[warmup] Pool de inferencia iniciado (EasyOCR es, en)")
     except Exception as e:
         print(f"[warmup] error: {e}")
 
 @app.on_event("startup")
 def startup_event() -> None:
-    threading.Thread(target=_warmup, daemon=True).start()
+    # Con fork los workers se crean aquí, antes de servir y sin otros threads vivos
+    # (con gunicorn los modelos ya vienen precargados del master).
+    if OCR_MP_START == "fork":
+        _warmup()
+    else:
+        threading.Thread(target=_warmup, daemon=True).start()
+
+@app.on_event("startup")
+async def start_job_queue() -> None:
+    await job_queue.start()
+
+@app.on_event("shutdown")
+async def shutdown_event() -> None:
+    await job_queue.stop()
+    await write_behind.drain()
+    await groq_client.aclose()
+    pool.shutdown()
 
 if __name__ == "__main__":
     import uvicorn
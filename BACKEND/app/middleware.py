@@ -3,11 +3,12 @@ from __future__ import annotations
 import logging
 import time
 from collections import deque
-from typing import Callable
+from typing import Callable, Mapping
 
-from fastapi import FastAPI, Request, Response
+from fastapi import FastAPI, HTTPException, Request, Response
 from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 logger = logging.getLogger("ocr.api")
 logging.basicConfig(
@@ -112,12 +113,84 @@ class SecurityHeadersMiddleware(BaseHTTPMiddleware):
             response.headers.setdefault(key, value)
         return response
 
+class BodyTooLarge(HTTPException):
+
+    def __init__(self, limit: int):
+        super().__init__(
+            status_code=413,
+            detail=f"Petición demasiado grande (>{limit // (1024 * 1024)}MB)",
+            headers={"Connection": "close"},
+        )
+
+class UploadSizeLimitMiddleware:
+
+    def __init__(self, app: ASGIApp, limits: Mapping[str, int]):
+        self.app    = app
+        self.limits = sorted(limits.items(), key=lambda kv: len(kv[0]), reverse=True)
+
+    def _limit_for(self, path: str) -> int | None:
+        for prefix, limit in self.limits:
+            if path.startswith(prefix):
+                return limit
+        return None
+
+    @staticmethod
+    async def _reject(send: Send, limit: int) -> None:
+        err = BodyTooLarge(limit)
+        response = JSONResponse(status_code=err.status_code, content={"detail": err.detail}, headers=err.headers)
+        await response({"type": "http"}, None, send)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope.get("method") not in {"POST", "PUT"}:
+            await self.app(scope, receive, send)
+            return
+
+        limit = self._limit_for(scope["path"])
+        if limit is None:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        declared = headers.get(b"content-length")
+        if declared is not None and declared.isdigit() and int(declared) > limit:
+            logger.warning("Upload rechazado por Content-Length %s > %d", declared.decode(), limit)
+            await self._reject(send, limit)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive() -> Message:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > limit:
+                    raise BodyTooLarge(limit)
+            return message
+
+        async def tracking_send(message: Message) -> None:
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except BodyTooLarge:
+            logger.warning("Upload abortado en %s tras %d bytes (límite %d)", scope["path"], received, limit)
+            if not response_started:
+                await self._reject(send, limit)
+
 def add_middlewares(
     app: FastAPI,
     rate_limit_max: int = 30,
     rate_limit_window: float = 60.0,
+    upload_limits: Mapping[str, int] | None = None,
 ) -> None:
 
+    if upload_limits:
+        app.add_middleware(UploadSizeLimitMiddleware, limits=upload_limits)
     app.add_middleware(SecurityHeadersMiddleware)
     app.add_middleware(
         RateLimitMiddleware,
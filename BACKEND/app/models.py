@@ -1,7 +1,17 @@
 from datetime import datetime
-from sqlalchemy import Integer, String, Text, DateTime
-from sqlalchemy.orm import Mapped, mapped_column
+from sqlalchemy import ForeignKey, Index, Integer, String, Text, DateTime, LargeBinary, event
+from sqlalchemy.orm import Mapped, Session, mapped_column, relationship
+from . import database
 from .database import Base
+from .text_store import OCR_TEXT_CODEC, pack, should_pack, unpack
+
+class OCRText(Base):
+    __tablename__ = "ocr_texts"
+
+    result_id: Mapped[int] = mapped_column(ForeignKey("ocr_results.id", ondelete="CASCADE"), primary_key=True)
+    codec: Mapped[str] = mapped_column(String(10))
+    size: Mapped[int] = mapped_column(Integer)
+    data: Mapped[bytes] = mapped_column(LargeBinary)
 
 class OCRResult(Base):
     __tablename__ = "ocr_results"
@@ -9,6 +19,88 @@ class OCRResult(Base):
     id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True)
     filename: Mapped[str] = mapped_column(String(255))
     estatus: Mapped[str] = mapped_column(String(50), default="Procesado")
-    text: Mapped[str | None] = mapped_column(Text, nullable=True)
+    inline_text: Mapped[str | None] = mapped_column("text", Text, nullable=True)
     created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
     doc_type_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+
+    blob: Mapped[OCRText | None] = relationship(lazy="select", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        Index("ix_ocr_results_estatus_id", "estatus", "id"),
+        Index("ix_ocr_results_doc_type_id_id", "doc_type_id", "id"),
+    )
+
+    @property
+    def text(self) -> str | None:
+        # Los textos largos viven comprimidos en ocr_texts y solo se cargan al pedirlos.
+        if self.inline_text is not None:
+            return self.inline_text
+        blob = self.blob
+        return unpack(blob.codec, blob.data) if blob is not None else None
+
+    @text.setter
+    def text(self, value: str | None) -> None:
+        if should_pack(value):
+            self.inline_text = None
+            self.blob = OCRText(codec=OCR_TEXT_CODEC, size=len(value), data=pack(value))
+        else:
+            self.inline_text = value
+            self.blob = None
+
+class OCRCacheEntry(Base):
+    __tablename__ = "ocr_cache"
+
+    key: Mapped[str] = mapped_column(String(64), primary_key=True)
+    text: Mapped[str] = mapped_column(Text)
+    engine: Mapped[str] = mapped_column(String(100))
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    last_hit_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    hits: Mapped[int] = mapped_column(Integer, default=0)
+
+class OCRJob(Base):
+    __tablename__ = "ocr_jobs"
+
+    id: Mapped[str] = mapped_column(String(32), primary_key=True)
+    status: Mapped[str] = mapped_column(String(20), default="queued", index=True)
+    filename: Mapped[str] = mapped_column(String(255))
+    lang: Mapped[str] = mapped_column(String(100), default="es,en")
+    mode: Mapped[str] = mapped_column(String(50), default="")
+    doc_type_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    payload: Mapped[bytes | None] = mapped_column(LargeBinary, nullable=True, deferred=True)
+    result_id: Mapped[int | None] = mapped_column(Integer, nullable=True)
+    engine: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    error: Mapped[str | None] = mapped_column(Text, nullable=True)
+    created_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, index=True)
+    updated_at: Mapped[datetime] = mapped_column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+def _fts_ids(objs) -> set[int]:
+    ids = set()
+    for obj in objs:
+        if isinstance(obj, OCRResult) and obj.id is not None:
+            ids.add(obj.id)
+        elif isinstance(obj, OCRText) and obj.result_id is not None:
+            ids.add(obj.result_id)
+    return ids
+
+@event.listens_for(Session, "before_flush")
+def _fts_before_flush(session: Session, _ctx, _instances) -> None:
+    # Mantiene ocr_results_fts == vista ocr_results_text: antes del flush se quitan las
+    # filas que cambian (con los valores indexados) y después se vuelven a indexar.
+    if not database.HAS_FTS:
+        return
+    changed = _fts_ids(o for o in session.dirty if session.is_modified(o)) | _fts_ids(session.deleted)
+    if changed:
+        database.fts_remove(session.connection(), sorted(changed))
+    gone = {o.id for o in session.deleted if isinstance(o, OCRResult)}
+    new = [o for o in session.new if isinstance(o, OCRResult)]
+    session.info["fts_pending"] = (new, changed - gone)
+
+@event.listens_for(Session, "after_flush")
+def _fts_after_flush(session: Session, _ctx) -> None:
+    pending = session.info.pop("fts_pending", None)
+    if pending is None:
+        return
+    new, changed = pending
+    ids = changed | {o.id for o in new}
+    if ids:
+        database.fts_add(session.connection(), sorted(ids))
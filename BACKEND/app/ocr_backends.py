@@ -0,0 +1,108 @@
+from __future__ import annotations
+
+import logging
+import os
+from pathlib import Path
+
+import torch
+
+logger = logging.getLogger("ocr.backends")
+
+BACKENDS = ("torch", "fp32", "onnx", "onnx-int8")
+
+def quantize_flag(backend: str) -> bool:
+    return backend == "torch"
+
+class _RecognizerExport(torch.nn.Module):
+
+    def __init__(self, model: torch.nn.Module):
+        super().__init__()
+        self.model = model
+
+    def forward(self, image):
+        return self.model(image, None)
+
+class OnnxModule:
+
+    def __init__(self, path: Path, outputs: int):
+        self.path = path
+        self.outputs = outputs
+        self._session = None
+        self._pid = None
+
+    def _bind(self):
+        if self._session is None or self._pid != os.getpid():
+            import onnxruntime as ort
+
+            options = ort.SessionOptions()
+            options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+            options.intra_op_num_threads = torch.get_num_threads()
+            options.inter_op_num_threads = torch.get_num_interop_threads()
+            self._session = ort.InferenceSession(str(self.path), options, providers=["CPUExecutionProvider"])
+            self._pid = os.getpid()
+        return self._session
+
+    def __call__(self, image, *_):
+        session = self._bind()
+        name = session.get_inputs()[0].name
+        out = session.run(None, {name: image.detach().cpu().numpy()})
+        tensors = [torch.from_numpy(o) for o in out]
+        return tensors[0] if self.outputs == 1 else tuple(tensors)
+
+    def eval(self):
+        return self
+
+    def to(self, *_args, **_kwargs):
+        return self
+
+def _export(module: torch.nn.Module, sample: torch.Tensor, path: Path, outputs: list[str], axes: dict) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    module.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            module, (sample,), str(tmp),
+            input_names=["image"], output_names=outputs,
+            dynamic_axes=axes, opset_version=17,
+        )
+    os.replace(tmp, path)
+    logger.info("Modelo exportado a ONNX: %s", path.name)
+
+def _quantized(path: Path) -> Path:
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    target = path.with_name(path.stem + ".int8.onnx")
+    if not target.exists():
+        quantize_dynamic(str(path), str(target), weight_type=QuantType.QInt8)
+        logger.info("Modelo ONNX cuantizado a int8: %s", target.name)
+    return target
+
+def _onnx_models(reader, model_dir: Path, int8: bool) -> tuple[OnnxModule, OnnxModule]:
+    onnx_dir = model_dir / "onnx"
+    detector = onnx_dir / "detector_craft.onnx"
+    recognizer = onnx_dir / f"recognizer_{reader.model_lang}.onnx"
+
+    if not detector.exists():
+        _export(
+            reader.detector, torch.zeros(1, 3, 320, 320), detector,
+            outputs=["score", "feature"],
+            axes={"image": {0: "batch", 2: "height", 3: "width"},
+                  "score": {0: "batch", 1: "h", 2: "w"},
+                  "feature": {0: "batch", 2: "h", 3: "w"}},
+        )
+    if not recognizer.exists():
+        _export(
+            _RecognizerExport(reader.recognizer), torch.zeros(1, 1, 64, 256), recognizer,
+            outputs=["logits"],
+            axes={"image": {0: "batch", 3: "width"}, "logits": {0: "batch", 1: "steps"}},
+        )
+    if int8:
+        detector, recognizer = _quantized(detector), _quantized(recognizer)
+    return OnnxModule(detector, outputs=2), OnnxModule(recognizer, outputs=1)
+
+def apply_backend(reader, backend: str, model_dir: Path):
+    if backend not in BACKENDS:
+        raise ValueError(f"OCR_BACKEND desconocido: {backend} (opciones: {', '.join(BACKENDS)})")
+    if backend.startswith("onnx"):
+        reader.detector, reader.recognizer = _onnx_models(reader, model_dir, int8=backend == "onnx-int8")
+    return reader
@@ -1,18 +1,25 @@
 from __future__ import annotations
 
-import base64
+import asyncio
+import gc
 import json
-import logging
 import os
 import urllib.request
 import urllib.error
-from io import BytesIO
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Iterable, Sequence
 
+import cv2
 import easyocr
 import numpy as np
-from PIL import Image, ImageOps
+from easyocr.utils import get_paragraph
+
+from . import tiling
+from .groq_client import GroqVisionClient
+from .preprocessing import ImageInput, as_array
+from .reader_registry import norm_langs, reader_registry
+from .region_cache import region_cache, region_hash
 
 try:
     from dotenv import load_dotenv
@@ -20,130 +27,161 @@ try:
 except ImportError:
     pass
 
-logger = logging.getLogger("ocr.engine")
-
-MODEL_DIR = Path(__file__).resolve().parent / "models"
-MODEL_DIR.mkdir(parents=True, exist_ok=True)
-
-GROQ_API_KEY = os.getenv("GROQ_API_KEY", "").strip()
-GROQ_MODEL   = os.getenv("GROQ_MODEL", "meta-llama/llama-4-scout-17b-16e-instruct").strip()
-GROQ_URL     = "https://api.groq.com/openai/v1/chat/completions"
-
-_easyocr_cache: dict[tuple, easyocr.Reader] = {}
-
-def _norm_langs(langs: Iterable[str] | None) -> tuple[str, ...]:
-    base = ["es", "en"] if not langs else [s.strip().lower() for s in langs if s.strip()]
-    return tuple(sorted(set(base)))
+EASYOCR_RECOG_BATCH = int(os.getenv("EASYOCR_RECOG_BATCH", "16"))
+OCR_BATCH_PAD_WASTE = float(os.getenv("OCR_BATCH_PAD_WASTE", "1.3"))
+OCR_PRELOAD_LANGS   = [
+    tuple(s.strip() for s in group.split(",") if s.strip())
+    for group in os.getenv("OCR_PRELOAD_LANGS", "es,en").split(";")
+    if group.strip()
+]
 
 def get_reader(langs: Sequence[str] | None) -> easyocr.Reader:
-    key = _norm_langs(langs)
-    if key not in _easyocr_cache:
-        _easyocr_cache[key] = easyocr.Reader(
-            list(key),
-            gpu=False,
-            model_storage_directory=str(MODEL_DIR),
-            download_enabled=True,
-        )
-    return _easyocr_cache[key]
-
-def _image_to_base64(image_bytes: bytes) -> str:
-    img = Image.open(BytesIO(image_bytes)).convert("RGB")
-    img = ImageOps.exif_transpose(img)
-    w, h = img.size
-    if max(w, h) > 1600:
-        r = 1600 / max(w, h)
-        img = img.resize((int(w * r), int(h * r)), Image.LANCZOS)
-    buf = BytesIO()
-    img.save(buf, format="JPEG", quality=90)
-    return base64.b64encode(buf.getvalue()).decode()
-
-def _run_groq_vision(image_bytes: bytes, max_retries: int = 4) -> str:
-    if not GROQ_API_KEY:
-        raise RuntimeError("GROQ_API_KEY no configurada en .env")
-
-    try:
-        import requests
-    except ImportError as e:
-        raise RuntimeError("requests no esta instalado (pip install requests)") from e
-
-    import time as _time
-
-    b64 = _image_to_base64(image_bytes)
-    payload = {
-        "model": GROQ_MODEL,
-        "messages": [{
-            "role": "user",
-            "content": [
-                {
-                    "type": "text",
-                    "text": (
-                        "Transcribe exactamente el texto manuscrito de esta imagen. "
-                        "Devuelve SOLO el texto tal como aparece, sin explicaciones, "
-                        "sin comentarios, sin comillas. Respeta los saltos de línea."
-                    )
-                },
-                {"type": "image_url", "image_url": {"url": f"data:image/jpeg;base64,{b64}"}},
-            ],
-        }],
-        "max_tokens": 1024,
-        "temperature": 0.1,
-    }
-
-    headers = {
-        "Authorization": f"Bearer {GROQ_API_KEY}",
-        "Content-Type":   "application/json",
-        "User-Agent":     "MODULAR-OCR/2.0 (https://github.com/chopperx3/modular)",
-    }
-
-    for attempt in range(max_retries):
+    return reader_registry.get(langs)
+
+def preload_readers(lang_sets: Iterable[Sequence[str]] | None = None) -> list[tuple[str, ...]]:
+    loaded = []
+    for langs in (OCR_PRELOAD_LANGS if lang_sets is None else lang_sets):
+        get_reader(langs)
+        loaded.append(norm_langs(langs))
+    gc.collect()
+    gc.freeze()
+    return loaded
+
+def _run_groq_vision(image: ImageInput, max_retries: int = 4) -> tuple[str, float]:
+    async def _once() -> tuple[str, float]:
+        client = GroqVisionClient()
         try:
-            resp = requests.post(GROQ_URL, json=payload, headers=headers, timeout=60)
-        except requests.RequestException as e:
-            if attempt == max_retries - 1:
-                raise RuntimeError(f"Groq API unreachable: {e}") from e
-            _time.sleep(2 ** attempt)
-            continue
-
-        if resp.status_code == 200:
-            data = resp.json()
-            return data["choices"][0]["message"]["content"].strip()
-
-        if resp.status_code == 429:
-
-            retry_after = resp.headers.get("Retry-After")
-            try:
-                wait_s = float(retry_after) if retry_after else (2 ** (attempt + 2))
-            except ValueError:
-                wait_s = 2 ** (attempt + 2)
-            wait_s = min(wait_s, 60.0)
-            if attempt < max_retries - 1:
-                logger.info("Groq rate limit (429). Esperando %.1fs antes de reintentar...", wait_s)
-                _time.sleep(wait_s)
+            return await client.transcribe_timed(image, max_retries=max_retries)
+        finally:
+            await client.aclose()
+    return asyncio.run(_once())
+
+def _pad_to_common_shape(arrays: Sequence[np.ndarray]) -> list[np.ndarray]:
+    h = max(a.shape[0] for a in arrays)
+    w = max(a.shape[1] for a in arrays)
+    out = []
+    for a in arrays:
+        canvas = np.full((h, w, 3), 255, dtype=np.uint8)
+        canvas[: a.shape[0], : a.shape[1]] = a
+        out.append(canvas)
+    return out
+
+def _size_groups(arrays: Sequence[np.ndarray], max_waste: float = OCR_BATCH_PAD_WASTE) -> list[list[int]]:
+    # Agrupa imágenes de tamaño parecido: el lienzo común no puede superar
+    # max_waste veces el área real del grupo.
+    def key(i: int) -> tuple[bool, int]:
+        h, w = arrays[i].shape[:2]
+        return h >= w, h * w
+
+    groups: list[list[int]] = []
+    for i in sorted(range(len(arrays)), key=key):
+        if groups and key(groups[-1][0])[0] == key(i)[0]:
+            members = groups[-1] + [i]
+            h = max(arrays[j].shape[0] for j in members)
+            w = max(arrays[j].shape[1] for j in members)
+            if h * w * len(members) <= max_waste * sum(key(j)[1] for j in members):
+                groups[-1].append(i)
                 continue
-            raise RuntimeError("Groq API rate limit alcanzado tras varios reintentos")
+        groups.append([i])
+    return groups
+
+def _run_easyocr(image: ImageInput, langs: Sequence[str] | None) -> str:
+    arr = as_array(image)
+    if tiling.needs_tiling(arr):
+        return _run_easyocr_tiled(arr, langs)
+    reader = get_reader(langs)
+    results = reader.readtext(arr, detail=0, paragraph=True)
+    return "\n".join(results).strip()
+
+def _detect_tiled(reader: easyocr.Reader, arr: np.ndarray) -> tuple[list, list]:
+    height, width = arr.shape[:2]
+    layout = tiling.tiles(height, width)
 
-        snippet = resp.text[:200].replace("\n", " ")
-        raise RuntimeError(f"Groq API error {resp.status_code}: {snippet}")
+    def _detect(tile: tuple[tiling.Tile, tiling.Tile]) -> tuple[list, list]:
+        x0, y0, x1, y1 = tile[0]
+        h_boxes, f_boxes = reader.detect(
+            np.ascontiguousarray(arr[y0:y1, x0:x1]), canvas_size=tiling.OCR_TILE_SIZE,
+        )
+        return h_boxes[0], f_boxes[0]
 
-    raise RuntimeError("Groq API: agotaron los reintentos")
+    with ThreadPoolExecutor(max_workers=tiling.OCR_TILE_THREADS) as ex:
+        detections = list(ex.map(_detect, layout))
+    return tiling.stitch(detections, layout, width)
 
-def _run_easyocr(image_bytes: bytes, langs: Sequence[str] | None) -> str:
+def _run_easyocr_tiled(arr: np.ndarray, langs: Sequence[str] | None) -> str:
     reader = get_reader(langs)
-    img = Image.open(BytesIO(image_bytes)).convert("RGB")
-    img = ImageOps.exif_transpose(img)
-    w, h = img.size
-    if max(w, h) > 2000:
-        r = 2000 / max(w, h)
-        img = img.resize((int(w * r), int(h * r)))
-    results = reader.readtext(np.array(img), detail=0, paragraph=True)
+    horizontal, free = _detect_tiled(reader, arr)
+    if not horizontal and not free:
+        return ""
+    # Misma conversión que hace readtext() internamente, para que la ruta
+    # por teselas reconozca exactamente la misma imagen en grises.
+    grey = cv2.cvtColor(arr, cv2.COLOR_BGR2GRAY)
+    results = reader.recognize(
+        grey, horizontal_list=horizontal, free_list=free,
+        detail=0, paragraph=True, batch_size=EASYOCR_RECOG_BATCH,
+    )
     return "\n".join(results).strip()
 
-def run_ocr(image_bytes: bytes, langs: Sequence[str] | None, handwriting: bool) -> tuple[str, str]:
-    if handwriting:
-        try:
-            return _run_groq_vision(image_bytes), "groq"
-        except Exception as e:
-            logger.warning("Groq Vision falló, usando EasyOCR como fallback: %s", e)
-            return _run_easyocr(image_bytes, langs), "easyocr (fallback)"
+def _clip(box: Sequence[int], width: int, height: int) -> tuple[int, int, int, int]:
+    return max(0, int(box[0])), min(width, int(box[1])), max(0, int(box[2])), min(height, int(box[3]))
+
+def _run_easyocr_regions(image: ImageInput, langs: Sequence[str] | None, doc_type_id: int) -> str:
+    arr = as_array(image)
+    reader = get_reader(langs)
+    if tiling.needs_tiling(arr):
+        horizontal, free = _detect_tiled(reader, arr)
+    else:
+        h_boxes, f_boxes = reader.detect(arr)
+        horizontal, free = h_boxes[0], f_boxes[0]
+    if not horizontal and not free:
+        return ""
+
+    height, width = arr.shape[:2]
+    grey = cv2.cvtColor(arr, cv2.COLOR_BGR2GRAY)
+    boxes = [_clip(b, width, height) for b in horizontal]
+    hashes = [region_hash(grey, b) for b in boxes]
+    scope = region_cache.scope(doc_type_id, norm_langs(langs))
+    cached = region_cache.get_many(scope, hashes)
+
+    lines = []
+    misses: dict[tuple[int, int, int, int], str | None] = {}
+    for box, h in zip(boxes, hashes):
+        if h in cached:
+            x_min, x_max, y_min, y_max = box
+            text, conf = cached[h]
+            lines.append(([[x_min, y_min], [x_max, y_min], [x_max, y_max], [x_min, y_max]], text, conf))
+        else:
+            misses[box] = h
+
+    if misses or free:
+        recognized = reader.recognize(
+            grey, horizontal_list=[list(b) for b in misses], free_list=free,
+            detail=1, paragraph=False, batch_size=EASYOCR_RECOG_BATCH,
+        )
+        fresh = {}
+        for pts, text, conf in recognized:
+            key = (int(pts[0][0]), int(pts[1][0]), int(pts[0][1]), int(pts[2][1]))
+            if misses.get(key) is not None:
+                fresh[misses[key]] = (text, float(conf))
+            lines.append((pts, text, conf))
+        region_cache.put_many(scope, fresh)
 
-    return _run_easyocr(image_bytes, langs), "easyocr"
+    paragraphs = get_paragraph(lines, x_ths=1, y_ths=0.5)
+    return "\n".join(text for _, text in paragraphs).strip()
+
+def _run_easyocr_batch(images: Sequence[ImageInput], langs: Sequence[str] | None) -> list[str]:
+    if len(images) == 1:
+        return [_run_easyocr(images[0], langs)]
+
+    reader = get_reader(langs)
+    arrays = [as_array(im) for im in images]
+
+    texts: list[str] = [""] * len(arrays)
+    for idxs in _size_groups(arrays):
+        batch = _pad_to_common_shape([arrays[i] for i in idxs])
+        results = reader.readtext_batched(
+            batch, detail=0, paragraph=True, batch_size=EASYOCR_RECOG_BATCH,
+        )
+        for i, lines in zip(idxs, results):
+            texts[i] = "\n".join(lines).strip()
+    return texts
@@ -136,28 +136,29 @@ def evaluate_single(
         engine=engine,
     )
 
-_easyocr_reader_cache: dict[tuple, "easyocr.Reader"] = {}
+_backend_registries: dict[str, "ReaderRegistry"] = {}
 
-def _get_easyocr_reader(langs: tuple[str, ...] = ("es", "en")) -> "easyocr.Reader":
+def _get_easyocr_reader(langs: tuple[str, ...] = ("es", "en"), backend: str | None = None) -> "easyocr.Reader":
     if not _EASYOCR_AVAILABLE:
         raise RuntimeError("EasyOCR no está instalado.")
-    if langs not in _easyocr_reader_cache:
-        model_dir = Path(__file__).resolve().parent / "models"
-        model_dir.mkdir(exist_ok=True)
-        _easyocr_reader_cache[langs] = easyocr.Reader(
-            list(langs),
-            gpu=False,
-            model_storage_directory=str(model_dir),
-            download_enabled=True,
-        )
-    return _easyocr_reader_cache[langs]
+    from .reader_registry import ReaderRegistry, reader_registry
+    if backend is None or backend == reader_registry.backend:
+        return reader_registry.get(langs)
+    if backend not in _backend_registries:
+        _backend_registries[backend] = ReaderRegistry(max_readers=1, allowed="", backend=backend)
+    return _backend_registries[backend].get(langs)
+
+def _split_engine(engine: str) -> tuple[str, str | None]:
+    name, _, backend = engine.partition("[")
+    return name, backend.rstrip("]") or None
 
 def run_easyocr_single(
     image_path: str | Path,
     langs: Sequence[str] = ("es", "en"),
     handwriting: bool = False,
+    backend: str | None = None,
 ) -> tuple[str, float]:
-    reader = _get_easyocr_reader(tuple(sorted(langs)))
+    reader = _get_easyocr_reader(tuple(sorted(langs)), backend)
     img    = Image.open(image_path).convert("RGB")
     arr    = np.array(img)
 
@@ -246,9 +247,8 @@ def run_groq_vision(image_path: str | Path) -> tuple[str, float]:
     from .ocr_engine import _run_groq_vision
     with open(image_path, "rb") as f:
         data = f.read()
-    t0 = time.perf_counter()
-    text = _run_groq_vision(data)
-    latency_ms = (time.perf_counter() - t0) * 1000.0
+    # La latencia es el ida y vuelta HTTP: las esperas del gobernador de cuota no cuentan.
+    text, latency_ms = _run_groq_vision(data)
     return text.strip(), latency_ms
 
 def _groq_available() -> bool:
@@ -286,6 +286,7 @@ def benchmark_dataset(
     engines: list[str] | None = None,
     max_images: int | None = None,
     handwriting_prefix: str = "handwritten",
+    backends: list[str] | None = None,
 ) -> dict[str, BenchmarkReport]:
     if engines is None:
         engines = []
@@ -311,6 +312,10 @@ def benchmark_dataset(
         langs = _tesseract_available_langs()
         print(f"[i] Tesseract listo. Idiomas instalados: {langs or '(ninguno)'}")
 
+    if backends and "easyocr" in engines:
+        i = engines.index("easyocr")
+        engines = engines[:i] + [f"easyocr[{b}]" for b in backends] + engines[i + 1:]
+
     items = list(ground_truth.items())
     if max_images is not None:
 
@@ -335,14 +340,13 @@ def benchmark_dataset(
             is_hw = handwriting_prefix in rel_path
 
             try:
-                if engine == "easyocr":
-                    predicted, latency = run_easyocr_single(image_path, handwriting=is_hw)
+                name, backend = _split_engine(engine)
+                if name == "easyocr":
+                    predicted, latency = run_easyocr_single(image_path, handwriting=is_hw, backend=backend)
                 elif engine == "tesseract":
                     predicted, latency = run_tesseract_ocr(image_path)
                 elif engine == "groq":
                     predicted, latency = run_groq_vision(image_path)
-
-                    time.sleep(2.0)
                 else:
                     raise ValueError(f"Motor desconocido: {engine}")
             except Exception as e:
@@ -435,6 +439,29 @@ def print_report(reports: dict[str, BenchmarkReport]) -> None:
 
     print(f"{'='*72}\n")
 
+def check_backend_tolerance(
+    reports: dict[str, BenchmarkReport],
+    tolerance: float,
+    reference: str = "torch",
+) -> list[str]:
+    base = reports.get(f"easyocr[{reference}]")
+    if base is None:
+        return []
+    failures = []
+    for name, rep in reports.items():
+        engine, backend = _split_engine(name)
+        if engine != "easyocr" or backend in (None, reference):
+            continue
+        d_cer = rep.mean_cer - base.mean_cer
+        d_wer = rep.mean_wer - base.mean_wer
+        speedup = base.mean_latency_ms / rep.mean_latency_ms if rep.mean_latency_ms else 0.0
+        ok = d_cer <= tolerance and d_wer <= tolerance
+        print(f"  {name:<22} ΔCER={d_cer:+.4f}  ΔWER={d_wer:+.4f}  x{speedup:.2f} vs {reference}"
+              f"  {'OK' if ok else 'FUERA DE TOLERANCIA'}")
+        if not ok:
+            failures.append(name)
+    return failures
+
 def save_results(reports: dict[str, BenchmarkReport], output_path: Path) -> None:
     data = {name: rep.to_dict() for name, rep in reports.items()}
     with open(output_path, "w", encoding="utf-8") as f:
@@ -454,6 +481,11 @@ def _parse_args():
                    help="Máximo de imágenes por categoría (debug rápido)")
     p.add_argument("--output",   default="benchmark_results.json",
                    help="Archivo JSON de salida")
+    p.add_argument("--backends", nargs="+", default=None,
+                   choices=["torch", "fp32", "onnx", "onnx-int8"],
+                   help="Backends de EasyOCR a comparar; 'torch' sirve de referencia")
+    p.add_argument("--tolerance", type=float, default=0.01,
+                   help="Aumento máximo de CER/WER permitido respecto a 'torch'")
     return p.parse_args()
 
 if __name__ == "__main__":
@@ -477,7 +509,11 @@ if __name__ == "__main__":
         base_dir=base_dir,
         engines=args.engines,
         max_images=args.max_images,
+        backends=args.backends,
     )
 
     print_report(reports)
     save_results(reports, Path(args.output))
+
+    if args.backends and check_backend_tolerance(reports, args.tolerance):
+        sys.exit(1)
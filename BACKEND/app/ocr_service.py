@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from typing import Sequence
+
+from sqlalchemy.orm import Session
+
+from .inference import pool
+from .models import OCRResult
+from .pdf_processing import is_pdf, ocr_pdf
+from .preprocessing import decode_image
+from .result_cache import cache_key, cached_engine, result_cache
+from .schemas import OCRResponse
+from .tiling import DECODE_MAX_SIDE
+from .write_behind import write_behind
+
+def parse_langs(lang: str | None) -> list[str]:
+    return [s.strip() for s in (lang or "es,en").split(",") if s.strip()]
+
+def is_handwriting(mode: str | None) -> bool:
+    return (mode or "").strip().lower() == "handwriting"
+
+async def process_bytes(
+    data: bytes, langs: Sequence[str], handwriting: bool, doc_type_id: int | None = None,
+) -> tuple[str, str]:
+    if len(data) == 0:
+        return "", "ninguno"
+    if is_pdf(data):
+        return await ocr_pdf(data, langs=langs, handwriting=handwriting, doc_type_id=doc_type_id)
+    image = await pool.run_io(decode_image, data, DECODE_MAX_SIDE)
+    return await pool.run_ocr(image, langs=langs, handwriting=handwriting, doc_type_id=doc_type_id)
+
+async def recognize(
+    db: Session, data: bytes, langs: Sequence[str], handwriting: bool, doc_type_id: int | None = None,
+) -> tuple[str, str]:
+    key = cache_key(data, langs, handwriting)
+    cached = result_cache.get(db, key)
+    if cached is not None:
+        text, engine = cached
+        return text, cached_engine(engine)
+
+    with pool.slot():
+        text, engine = await process_bytes(data, langs=langs, handwriting=handwriting, doc_type_id=doc_type_id)
+    result_cache.put(db, key, text, engine)
+    return text, engine
+
+def error_row(filename: str, error: Exception, doc_type_id: int | None) -> OCRResult:
+    return OCRResult(filename=filename, text=None, estatus=f"Error: {error}", doc_type_id=doc_type_id)
+
+def result_row(filename: str, text: str, doc_type_id: int | None) -> OCRResult:
+    return OCRResult(
+        filename=filename,
+        text=text,
+        estatus="Procesado",
+        doc_type_id=doc_type_id,
+    )
+
+async def _save(db: Session, row: OCRResult) -> OCRResult:
+    if write_behind.enabled:
+        return await write_behind.add(row)
+    db.add(row); db.commit(); db.refresh(row)
+    return row
+
+async def store_error(db: Session, filename: str, error: Exception, doc_type_id: int | None) -> OCRResult:
+    return await _save(db, error_row(filename, error, doc_type_id))
+
+async def store_result(db: Session, filename: str, text: str, engine: str, doc_type_id: int | None) -> OCRResponse:
+    row = await _save(db, result_row(filename, text, doc_type_id))
+    return to_response(row, engine)
+
+def to_response(row: OCRResult, engine: str | None) -> OCRResponse:
+    return OCRResponse(
+        id=row.id,
+        filename=row.filename,
+        estatus=row.estatus,
+        text=row.text or "",
+        created_at=row.created_at,
+        doc_type_id=row.doc_type_id,
+        engine=engine,
+    )
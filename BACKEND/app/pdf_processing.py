@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import tempfile
+from pathlib import Path
+from typing import Sequence
+
+import numpy as np
+
+from .inference import pool
+from .preprocessing import prepare_pil
+from .tiling import DECODE_MAX_SIDE
+
+logger = logging.getLogger("ocr.pdf")
+
+PDF_DPI             = int(os.getenv("PDF_DPI", "220"))
+PDF_PAGES_IN_FLIGHT = int(os.getenv("PDF_PAGES_IN_FLIGHT", "4"))
+PDF_TEXT_LAYER      = os.getenv("PDF_TEXT_LAYER", "1").strip() not in {"0", "false", "no"}
+PDF_TEXT_MIN_CHARS  = int(os.getenv("PDF_TEXT_MIN_CHARS", "40"))
+PAGE_BREAK          = "\n\n--- PAGE BREAK ---\n\n"
+TEXT_LAYER_ENGINE   = "pdf-text"
+# Las columnas engine son String(100) y la caché añade "cache (…)" alrededor.
+ENGINE_LABEL_MAX    = 80
+
+class PDFUnsupported(RuntimeError):
+    pass
+
+def is_pdf(data: bytes) -> bool:
+    return data[:5] == b"%PDF-"
+
+def _pdf2image():
+    try:
+        import pdf2image
+    except ImportError as e:
+        raise PDFUnsupported(str(e)) from e
+    return pdf2image
+
+def _page_count(path: str) -> int:
+    pdfinfo_from_path = _pdf2image().pdfinfo_from_path
+    from pdf2image.exceptions import PDFInfoNotInstalledError
+    try:
+        return int(pdfinfo_from_path(path)["Pages"])
+    except PDFInfoNotInstalledError as e:
+        raise PDFUnsupported("poppler no está instalado") from e
+
+def _usable_text(text: str | None) -> str | None:
+    text = (text or "").strip()
+    alnum = sum(c.isalnum() for c in text)
+    if alnum < PDF_TEXT_MIN_CHARS:
+        return None
+    if text.count("\ufffd") > alnum // 10:
+        return None
+    return text
+
+def _text_layer(path: str) -> list[str | None] | None:
+    if not PDF_TEXT_LAYER:
+        return None
+    try:
+        from pypdf import PdfReader
+    except ImportError:
+        return None
+    try:
+        reader = PdfReader(path)
+        out: list[str | None] = []
+        for page in reader.pages:
+            try:
+                out.append(_usable_text(page.extract_text()))
+            except Exception:
+                out.append(None)
+        return out
+    except Exception as e:
+        logger.warning("No se pudo leer la capa de texto del PDF: %s", e)
+        return None
+
+def _page_ranges(pages: list[int]) -> str:
+    out: list[str] = []
+    start = prev = pages[0]
+    for p in pages[1:] + [None]:
+        if p is not None and p == prev + 1:
+            prev = p
+            continue
+        out.append(str(start) if start == prev else f"{start}-{prev}")
+        if p is not None:
+            start = prev = p
+    return ", ".join(out)
+
+def _describe_engines(page_engines: list[str]) -> str:
+    by_engine: dict[str, list[int]] = {}
+    for i, engine in enumerate(page_engines, start=1):
+        by_engine.setdefault(engine, []).append(i)
+    if len(by_engine) == 1:
+        return next(iter(by_engine))
+    label = ", ".join(f"{engine} [{_page_ranges(pages)}]" for engine, pages in sorted(by_engine.items()))
+    if len(label) > ENGINE_LABEL_MAX:
+        label = ", ".join(f"{engine} ({len(pages)} págs)" for engine, pages in sorted(by_engine.items()))
+    return label if len(label) <= ENGINE_LABEL_MAX else label[:ENGINE_LABEL_MAX - 1] + "…"
+
+def _render_page(path: str, page_no: int) -> np.ndarray:
+    pages = _pdf2image().convert_from_path(path, dpi=PDF_DPI, fmt="jpeg", first_page=page_no, last_page=page_no)
+    if not pages:
+        raise RuntimeError(f"No se pudo rasterizar la página {page_no}")
+    try:
+        return prepare_pil(pages[0], DECODE_MAX_SIDE)
+    finally:
+        for pg in pages:
+            pg.close()
+
+async def _ocr_page(
+    path: str, page_no: int, langs: Sequence[str], handwriting: bool, doc_type_id: int | None,
+    in_flight: asyncio.Semaphore,
+) -> tuple[str, str]:
+    async with in_flight:
+        page = await pool.run_io(_render_page, path, page_no)
+        return await pool.run_ocr(page, langs=langs, handwriting=handwriting, doc_type_id=doc_type_id)
+
+async def _gather_or_cancel(coros) -> list:
+    tasks = [asyncio.ensure_future(c) for c in coros]
+    try:
+        return await asyncio.gather(*tasks)
+    except BaseException:
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        raise
+
+async def ocr_pdf(
+    data: bytes, langs: Sequence[str], handwriting: bool, doc_type_id: int | None = None,
+) -> tuple[str, str]:
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        layer = await pool.run_io(_text_layer, path)
+        n_pages = len(layer) if layer is not None else await pool.run_io(_page_count, path)
+        layer = layer or [None] * n_pages
+        n_text = sum(t is not None for t in layer)
+        # Cada página en vuelo cuenta contra la capacidad del pool; la petición ya
+        # ocupa un slot, así que se reservan los restantes (o se responde 503).
+        pages_in_flight = max(1, min(PDF_PAGES_IN_FLIGHT, n_pages - n_text, pool.capacity))
+        logger.info(
+            "PDF de %d páginas: %d con texto embebido, %d a OCR (máx. %d en vuelo)",
+            n_pages, n_text, n_pages - n_text, pages_in_flight,
+        )
+        in_flight = asyncio.Semaphore(pages_in_flight)
+
+        async def _page(i: int) -> tuple[str, str]:
+            if layer[i - 1] is not None:
+                return layer[i - 1], TEXT_LAYER_ENGINE
+            return await _ocr_page(path, i, langs, handwriting, doc_type_id, in_flight)
+
+        with pool.slot(pages_in_flight - 1):
+            results = await _gather_or_cancel(_page(i) for i in range(1, n_pages + 1))
+    finally:
+        Path(path).unlink(missing_ok=True)
+
+    if not results:
+        return "", "ninguno"
+    text = PAGE_BREAK.join(t for t, _ in results if t.strip())
+    return text, _describe_engines([engine for _, engine in results])
@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import base64
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, ImageOps
+
+MAX_SIDE      = 2000
+GROQ_MAX_SIDE = 1600
+
+ImageInput = bytes | np.ndarray | Image.Image
+
+def sniff_mime(head: bytes) -> str | None:
+    if head[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if head[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[:5] == b"%PDF-":
+        return "application/pdf"
+    return None
+
+def fit_max_side(im: Image.Image, max_side: int, resample=Image.BICUBIC) -> Image.Image:
+    w, h = im.size
+    if max(w, h) <= max_side:
+        return im
+    r = max_side / float(max(w, h))
+    return im.resize((int(w * r), int(h * r)), resample)
+
+def prepare_pil(im: Image.Image, max_side: int = MAX_SIDE) -> np.ndarray:
+    im = ImageOps.exif_transpose(im)
+    if im.mode != "RGB":
+        im = im.convert("RGB")
+    return np.asarray(fit_max_side(im, max_side))
+
+def _reduced_load(im: Image.Image, max_side: int) -> Image.Image:
+    w, h = im.size
+    if max(w, h) <= max_side:
+        return im
+
+    if im.format == "JPEG":
+        r = max_side / float(max(w, h))
+        im.draft("RGB", (max(1, int(w * r)), max(1, int(h * r))))
+        return im
+
+    factor = max(w, h) // max_side
+    if factor >= 2:
+        return im.reduce(factor)
+    return im
+
+def decode_image(data: bytes, max_side: int = MAX_SIDE) -> np.ndarray:
+    with Image.open(BytesIO(data)) as im:
+        return prepare_pil(_reduced_load(im, max_side), max_side)
+
+def as_array(image: ImageInput, max_side: int = MAX_SIDE) -> np.ndarray:
+    if isinstance(image, np.ndarray):
+        return image
+    if isinstance(image, Image.Image):
+        return prepare_pil(image, max_side)
+    return decode_image(image, max_side)
+
+def encode_jpeg_base64(image: ImageInput, max_side: int = GROQ_MAX_SIDE, quality: int = 90) -> str:
+    arr = as_array(image, max_side)
+    im = fit_max_side(Image.fromarray(arr), max_side, Image.LANCZOS)
+    buf = BytesIO()
+    im.save(buf, format="JPEG", quality=quality)
+    return base64.b64encode(buf.getvalue()).decode()
@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+logger = logging.getLogger("ocr.governor")
+
+GROQ_RPM                = float(os.getenv("GROQ_RPM", "30"))
+GROQ_TPM                = float(os.getenv("GROQ_TPM", "30000"))
+GROQ_TOKENS_PER_REQUEST = int(os.getenv("GROQ_TOKENS_PER_REQUEST", "1800"))
+GROQ_GOVERNOR_DB        = os.getenv(
+    "GROQ_GOVERNOR_DB", str(Path(__file__).resolve().parent / "groq_governor.db")
+)
+
+class TokenBucketGovernor:
+
+    def __init__(
+        self,
+        path: str = GROQ_GOVERNOR_DB,
+        requests_per_minute: float = GROQ_RPM,
+        tokens_per_minute: float = GROQ_TPM,
+    ):
+        self.path    = path
+        self.buckets = {
+            name: per_min
+            for name, per_min in (("requests", requests_per_minute), ("tokens", tokens_per_minute))
+            if per_min > 0
+        }
+        self._waited_s = 0.0
+        self._reservations = 0
+        self._errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.buckets)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            " name TEXT PRIMARY KEY, level REAL NOT NULL, updated REAL NOT NULL)"
+        )
+        return conn
+
+    def _debit(self, costs: dict[str, float]) -> float:
+        now = time.time()
+        wait_s = 0.0
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for name, cost in costs.items():
+                capacity = self.buckets.get(name)
+                if capacity is None:
+                    continue
+                rate = capacity / 60.0
+                row = conn.execute("SELECT level, updated FROM buckets WHERE name = ?", (name,)).fetchone()
+                level = capacity if row is None else min(capacity, row[0] + (now - row[1]) * rate)
+                level = min(capacity, level - cost)
+                if level < 0:
+                    wait_s = max(wait_s, -level / rate)
+                conn.execute(
+                    "INSERT INTO buckets (name, level, updated) VALUES (?, ?, ?) "
+                    "ON CONFLICT(name) DO UPDATE SET level = excluded.level, updated = excluded.updated",
+                    (name, level, now),
+                )
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+        return wait_s
+
+    def reserve(self, tokens: int = GROQ_TOKENS_PER_REQUEST) -> float:
+        if not self.enabled:
+            return 0.0
+        wait_s = self._debit({"requests": 1, "tokens": tokens})
+        self._reservations += 1
+        self._waited_s += wait_s
+        return wait_s
+
+    def settle(self, estimated: int, actual: int | None) -> None:
+        if not self.enabled or actual is None or actual == estimated:
+            return
+        try:
+            self._debit({"tokens": actual - estimated})
+        except sqlite3.Error as e:
+            logger.warning("No se pudo ajustar el bucket de tokens: %s", e)
+
+    async def acquire(self, tokens: int = GROQ_TOKENS_PER_REQUEST) -> None:
+        # Un fallo local del bucket no es un fallo de Groq: se deja pasar la petición
+        # en lugar de propagarlo al circuit breaker.
+        try:
+            wait_s = await asyncio.to_thread(self.reserve, tokens)
+        except sqlite3.Error as e:
+            self._errors += 1
+            logger.warning("Gobernador de cuota no disponible, se continúa sin esperar: %s", e)
+            return
+        if wait_s > 0:
+            logger.info("Groq: esperando %.1fs para respetar la cuota", wait_s)
+            await asyncio.sleep(wait_s)
+
+    def stats(self) -> dict:
+        return {
+            "limits_per_minute": self.buckets,
+            "reservations":      self._reservations,
+            "waited_s":          round(self._waited_s, 1),
+            "errors":            self._errors,
+        }
+
+groq_governor = TokenBucketGovernor()
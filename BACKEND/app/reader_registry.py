@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Callable, Iterable, Sequence
+
+logger = logging.getLogger("ocr.readers")
+
+MODEL_DIR = Path(__file__).resolve().parent / "models"
+
+OCR_READER_CACHE_MAX   = int(os.getenv("OCR_READER_CACHE_MAX", "3"))
+OCR_READER_CACHE_MB    = float(os.getenv("OCR_READER_CACHE_MB", "1024"))
+OCR_ALLOWED_LANG_SETS  = os.getenv("OCR_ALLOWED_LANG_SETS", "es;en;es,en")
+OCR_BACKEND            = os.getenv("OCR_BACKEND", "torch").strip().lower()
+READER_FALLBACK_MB     = 100.0
+
+COUNTERS = ("hits", "misses", "loads", "load_s", "evictions")
+
+class LanguageNotAllowed(ValueError):
+    pass
+
+def norm_langs(langs: Iterable[str] | None) -> tuple[str, ...]:
+    base = ["es", "en"] if not langs else [s.strip().lower() for s in langs if s.strip()]
+    return tuple(sorted(set(base)))
+
+def parse_lang_sets(spec: str) -> set[tuple[str, ...]]:
+    return {norm_langs(group.split(",")) for group in spec.split(";") if group.strip()}
+
+def _easyocr_factory(langs: tuple[str, ...], backend: str = OCR_BACKEND):
+    import easyocr
+    from .ocr_backends import apply_backend, quantize_flag
+    MODEL_DIR.mkdir(parents=True, exist_ok=True)
+    reader = easyocr.Reader(
+        list(langs),
+        gpu=False,
+        model_storage_directory=str(MODEL_DIR),
+        download_enabled=True,
+        quantize=quantize_flag(backend),
+    )
+    return apply_backend(reader, backend, MODEL_DIR)
+
+def estimate_mb(reader) -> float:
+    total = 0
+    for name in ("detector", "recognizer"):
+        module = getattr(reader, name, None)
+        params = getattr(module, "parameters", None)
+        if params is None:
+            continue
+        total += sum(p.numel() * p.element_size() for p in params())
+    return round(total / (1024 * 1024), 1) if total else READER_FALLBACK_MB
+
+def counter_stats(counters) -> dict:
+    values = dict(zip(COUNTERS, list(counters)))
+    lookups = values["hits"] + values["misses"]
+    return {
+        "hits":       int(values["hits"]),
+        "misses":     int(values["misses"]),
+        "hit_rate":   round(values["hits"] / lookups, 3) if lookups else None,
+        "loads":      int(values["loads"]),
+        "load_s_avg": round(values["load_s"] / values["loads"], 2) if values["loads"] else None,
+        "evictions":  int(values["evictions"]),
+    }
+
+class ReaderRegistry:
+
+    def __init__(
+        self,
+        factory: Callable[[tuple[str, ...], str], object] = _easyocr_factory,
+        max_readers: int = OCR_READER_CACHE_MAX,
+        max_mb: float = OCR_READER_CACHE_MB,
+        allowed: str = OCR_ALLOWED_LANG_SETS,
+        backend: str = OCR_BACKEND,
+    ):
+        self.factory     = factory
+        self.backend     = backend
+        self.max_readers = max(1, max_readers)
+        self.max_mb      = max_mb
+        self.allowed     = parse_lang_sets(allowed)
+
+        self._lock = threading.Lock()
+        self._readers: OrderedDict[tuple[str, ...], tuple[object, float]] = OrderedDict()
+        self._loading: dict[tuple[str, ...], threading.Lock] = {}
+        self._counters = [0.0] * len(COUNTERS)
+
+    def share_counters(self, counters) -> None:
+        self._counters = counters
+
+    def _bump(self, name: str, amount: float = 1) -> None:
+        lock = getattr(self._counters, "get_lock", None)
+        with lock() if lock else nullcontext():
+            self._counters[COUNTERS.index(name)] += amount
+
+    def check(self, langs: Sequence[str] | None) -> tuple[str, ...]:
+        key = norm_langs(langs)
+        if self.allowed and key not in self.allowed:
+            allowed = "; ".join(",".join(k) for k in sorted(self.allowed))
+            raise LanguageNotAllowed(f"Idiomas no permitidos: {','.join(key)} (permitidos: {allowed})")
+        return key
+
+    def get(self, langs: Sequence[str] | None):
+        key = self.check(langs)
+        with self._lock:
+            if key in self._readers:
+                self._readers.move_to_end(key)
+                self._bump("hits")
+                return self._readers[key][0]
+            loading = self._loading.setdefault(key, threading.Lock())
+
+        with loading:
+            with self._lock:
+                if key in self._readers:
+                    self._readers.move_to_end(key)
+                    self._bump("hits")
+                    return self._readers[key][0]
+            self._bump("misses")
+            t0 = time.perf_counter()
+            reader = self.factory(key, self.backend)
+            elapsed = time.perf_counter() - t0
+            size_mb = estimate_mb(reader)
+            self._bump("loads")
+            self._bump("load_s", elapsed)
+            logger.info("Reader EasyOCR %s cargado en %.1fs (~%.0f MB)", ",".join(key), elapsed, size_mb)
+
+            with self._lock:
+                self._readers[key] = (reader, size_mb)
+                self._loading.pop(key, None)
+                self._evict()
+        return reader
+
+    def _evict(self) -> None:
+        while len(self._readers) > 1 and (
+            len(self._readers) > self.max_readers
+            or (self.max_mb > 0 and self._total_mb() > self.max_mb)
+        ):
+            key, (_, size_mb) = self._readers.popitem(last=False)
+            self._bump("evictions")
+            logger.info("Reader EasyOCR %s descartado (~%.0f MB)", ",".join(key), size_mb)
+
+    def _total_mb(self) -> float:
+        return sum(size for _, size in self._readers.values())
+
+    def stats(self) -> dict:
+        with self._lock:
+            loaded = {",".join(k): size for k, (_, size) in self._readers.items()}
+            total = self._total_mb()
+        return {
+            "loaded":      loaded,
+            "size_mb":     round(total, 1),
+            "max_readers": self.max_readers,
+            "max_mb":      self.max_mb,
+            "allowed":     sorted(",".join(k) for k in self.allowed),
+            "backend":     self.backend,
+            **counter_stats(self._counters),
+        }
+
+reader_registry = ReaderRegistry()
@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import nullcontext
+from pathlib import Path
+from typing import Sequence
+
+import cv2
+import numpy as np
+
+logger = logging.getLogger("ocr.regions")
+
+OCR_REGION_CACHE          = os.getenv("OCR_REGION_CACHE", "0").strip() in {"1", "true", "yes"}
+OCR_REGION_CACHE_DB       = os.getenv(
+    "OCR_REGION_CACHE_DB", str(Path(__file__).resolve().parent / "region_cache.db")
+)
+OCR_REGION_CACHE_MEMORY   = int(os.getenv("OCR_REGION_CACHE_MEMORY", "5000"))
+OCR_REGION_CACHE_DB_ITEMS = int(os.getenv("OCR_REGION_CACHE_DB_ITEMS", "200000"))
+OCR_REGION_CACHE_MIN_CONF = float(os.getenv("OCR_REGION_CACHE_MIN_CONF", "0.5"))
+HASH_ROWS                 = 16
+HASH_MAX_COLS             = 512
+HASH_DEAD_ZONE            = 8
+
+COUNTERS = ("hits", "misses")
+
+def region_hash(grey: np.ndarray, box: Sequence[int]) -> str | None:
+    x_min, x_max, y_min, y_max = box
+    crop = grey[max(0, y_min):y_max, max(0, x_min):x_max]
+    if crop.size == 0 or crop.shape[0] < 2 or crop.shape[1] < 2:
+        return None
+    cols = int(np.clip(round(HASH_ROWS * crop.shape[1] / crop.shape[0]), HASH_ROWS, HASH_MAX_COLS))
+    small = cv2.resize(crop, (cols + 1, HASH_ROWS), interpolation=cv2.INTER_AREA).astype(np.int16)
+    diff = small[:, 1:] - small[:, :-1]
+    signs = np.sign(diff) * (np.abs(diff) > HASH_DEAD_ZONE)
+    h = hashlib.blake2b(signs.astype(np.int8).tobytes(), digest_size=16)
+    h.update(f"{cols}:{crop.shape[1] // 8}:{crop.shape[0] // 4}".encode())
+    return h.hexdigest()
+
+class RegionCache:
+
+    def __init__(
+        self,
+        path: str = OCR_REGION_CACHE_DB,
+        enabled: bool = OCR_REGION_CACHE,
+        memory_items: int = OCR_REGION_CACHE_MEMORY,
+        db_items: int = OCR_REGION_CACHE_DB_ITEMS,
+        min_conf: float = OCR_REGION_CACHE_MIN_CONF,
+    ):
+        self.path         = path
+        self.enabled      = enabled
+        self.memory_items = memory_items
+        self.db_items     = db_items
+        self.min_conf     = min_conf
+
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, tuple[str, float]] = OrderedDict()
+        self._counters = [0.0] * len(COUNTERS)
+        self._writes = 0
+
+    def share_counters(self, counters) -> None:
+        self._counters = counters
+
+    def _bump(self, hits: int, misses: int) -> None:
+        lock = getattr(self._counters, "get_lock", None)
+        with lock() if lock else nullcontext():
+            self._counters[0] += hits
+            self._counters[1] += misses
+
+    @staticmethod
+    def scope(doc_type_id: int, langs: Sequence[str]) -> str:
+        return f"{doc_type_id}:{','.join(langs)}"
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS regions ("
+            " key TEXT PRIMARY KEY, text TEXT NOT NULL, conf REAL NOT NULL, created_at REAL NOT NULL)"
+        )
+        return conn
+
+    def get_many(self, scope: str, hashes: Sequence[str | None]) -> dict[str, tuple[str, float]]:
+        wanted = {h for h in hashes if h is not None}
+        found: dict[str, tuple[str, float]] = {}
+        with self._lock:
+            for h in wanted:
+                hit = self._memory.get(f"{scope}:{h}")
+                if hit is not None:
+                    self._memory.move_to_end(f"{scope}:{h}")
+                    found[h] = hit
+
+        missing = [h for h in wanted if h not in found]
+        if missing:
+            try:
+                conn = self._connect()
+                try:
+                    for i in range(0, len(missing), 500):
+                        chunk = missing[i:i + 500]
+                        rows = conn.execute(
+                            f"SELECT key, text, conf FROM regions WHERE key IN ({','.join('?' * len(chunk))})",
+                            [f"{scope}:{h}" for h in chunk],
+                        ).fetchall()
+                        for key, text, conf in rows:
+                            found[key.rsplit(":", 1)[1]] = (text, conf)
+                finally:
+                    conn.close()
+            except sqlite3.Error as e:
+                logger.warning("Caché de regiones no disponible: %s", e)
+            self._remember({f"{scope}:{h}": found[h] for h in missing if h in found})
+
+        hits = sum(1 for h in hashes if h in found)
+        self._bump(hits, len(hashes) - hits)
+        return found
+
+    def _remember(self, entries: dict[str, tuple[str, float]]) -> None:
+        with self._lock:
+            for key, value in entries.items():
+                self._memory[key] = value
+                self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_items:
+                self._memory.popitem(last=False)
+
+    def put_many(self, scope: str, entries: dict[str, tuple[str, float]]) -> None:
+        rows = {
+            f"{scope}:{h}": (text, conf)
+            for h, (text, conf) in entries.items()
+            if conf >= self.min_conf
+        }
+        if not rows:
+            return
+        self._remember(rows)
+        try:
+            conn = self._connect()
+            try:
+                now = time.time()
+                with conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO regions (key, text, conf, created_at) VALUES (?, ?, ?, ?)",
+                        [(k, t, c, now) for k, (t, c) in rows.items()],
+                    )
+                self._writes += len(rows)
+                if self._writes >= 1000:
+                    self._writes = 0
+                    with conn:
+                        conn.execute(
+                            "DELETE FROM regions WHERE key IN ("
+                            " SELECT key FROM regions ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                            (self.db_items,),
+                        )
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            logger.warning("No se pudo guardar en la caché de regiones: %s", e)
+
+    def stats(self) -> dict:
+        hits, misses = (int(v) for v in list(self._counters))
+        lookups = hits + misses
+        return {
+            "enabled":  self.enabled,
+            "hits":     hits,
+            "misses":   misses,
+            "hit_rate": round(hits / lookups, 3) if lookups else None,
+        }
+
+region_cache = RegionCache()
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Sequence
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.orm import Session
+
+from .models import OCRCacheEntry
+from .reader_registry import norm_langs
+
+logger = logging.getLogger("ocr.cache")
+
+OCR_CACHE_ENABLED      = os.getenv("OCR_CACHE_ENABLED", "1").strip() not in {"0", "false", "no"}
+OCR_CACHE_MEMORY_ITEMS = int(os.getenv("OCR_CACHE_MEMORY_ITEMS", "256"))
+OCR_CACHE_DB_ITEMS     = int(os.getenv("OCR_CACHE_DB_ITEMS", "10000"))
+OCR_CACHE_TTL          = float(os.getenv("OCR_CACHE_TTL", str(7 * 24 * 3600)))
+
+def _cacheable(engine: str) -> bool:
+    return engine != "ninguno" and "fallback" not in engine and "hedge" not in engine
+
+def _utc_ts(dt: datetime) -> float:
+    return dt.replace(tzinfo=timezone.utc).timestamp()
+
+def cache_key(data: bytes, langs: Sequence[str] | None, handwriting: bool) -> str:
+    h = hashlib.sha256(data)
+    h.update(b"\0" + ",".join(norm_langs(langs)).encode())
+    h.update(b"\0hw" if handwriting else b"\0pr")
+    return h.hexdigest()
+
+def cached_engine(engine: str) -> str:
+    return f"cache ({engine})"
+
+class ResultCache:
+
+    def __init__(
+        self,
+        memory_items: int = OCR_CACHE_MEMORY_ITEMS,
+        db_items: int = OCR_CACHE_DB_ITEMS,
+        ttl_seconds: float = OCR_CACHE_TTL,
+        enabled: bool = OCR_CACHE_ENABLED,
+    ):
+        self.memory_items = max(0, memory_items)
+        self.db_items     = max(0, db_items)
+        self.ttl_seconds  = ttl_seconds
+        self.enabled      = enabled
+
+        self._lru: OrderedDict[str, tuple[float, str, str]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits_memory = 0
+        self._hits_db = 0
+        self._misses = 0
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl_seconds > 0 and time.time() - created > self.ttl_seconds
+
+    def _remember(self, key: str, created: float, text: str, engine: str) -> None:
+        if self.memory_items == 0:
+            return
+        with self._lock:
+            self._lru[key] = (created, text, engine)
+            self._lru.move_to_end(key)
+            while len(self._lru) > self.memory_items:
+                self._lru.popitem(last=False)
+
+    def get(self, db: Session, key: str) -> tuple[str, str] | None:
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._lru.get(key)
+            if entry is not None:
+                if self._expired(entry[0]):
+                    del self._lru[key]
+                else:
+                    self._lru.move_to_end(key)
+                    self._hits_memory += 1
+                    return entry[1], entry[2]
+
+        row = db.get(OCRCacheEntry, key)
+        if row is None:
+            self._misses += 1
+            return None
+
+        created = _utc_ts(row.created_at)
+        if self._expired(created):
+            db.delete(row)
+            db.commit()
+            self._misses += 1
+            return None
+
+        row.hits += 1
+        row.last_hit_at = datetime.utcnow()
+        db.commit()
+        self._hits_db += 1
+        self._remember(key, created, row.text, row.engine)
+        return row.text, row.engine
+
+    def put(self, db: Session, key: str, text: str, engine: str) -> None:
+        if not self.enabled or not _cacheable(engine):
+            return
+
+        now = datetime.utcnow()
+        self._remember(key, _utc_ts(now), text, engine)
+        if self.db_items == 0:
+            return
+
+        try:
+            row = db.get(OCRCacheEntry, key)
+            if row is None:
+                db.add(OCRCacheEntry(key=key, text=text, engine=engine, created_at=now, last_hit_at=now))
+            else:
+                row.text, row.engine, row.created_at, row.last_hit_at = text, engine, now, now
+            db.commit()
+            self._evict(db)
+        except Exception as e:
+            db.rollback()
+            logger.warning("No se pudo guardar en la caché de resultados: %s", e)
+
+    def _evict(self, db: Session) -> None:
+        if self.ttl_seconds > 0:
+            cutoff = datetime.utcnow() - timedelta(seconds=self.ttl_seconds)
+            db.execute(delete(OCRCacheEntry).where(OCRCacheEntry.created_at < cutoff))
+
+        total = db.execute(select(func.count()).select_from(OCRCacheEntry)).scalar_one()
+        excess = total - self.db_items
+        if excess > 0:
+            oldest = (
+                select(OCRCacheEntry.key)
+                .order_by(OCRCacheEntry.last_hit_at.asc())
+                .limit(excess)
+            )
+            db.execute(delete(OCRCacheEntry).where(OCRCacheEntry.key.in_(oldest)))
+        db.commit()
+
+    def stats(self) -> dict:
+        return {
+            "enabled":     self.enabled,
+            "memory_size": len(self._lru),
+            "hits_memory": self._hits_memory,
+            "hits_db":     self._hits_db,
+            "misses":      self._misses,
+        }
+
+result_cache = ResultCache()
@@ -106,6 +106,7 @@ async def evaluate_single_image(
     ground_truth: str | None = Query(None, description="Texto esperado para calcular métricas"),
 ):
     import tempfile, os
+    from ..inference import PoolSaturated, pool
     from ..ocr_metrics import (
         run_easyocr_single, run_tesseract_ocr,
         compute_cer, compute_wer, compute_char_metrics,
@@ -122,13 +123,22 @@ async def evaluate_single_image(
 
     try:
 
+        # Ambos motores bloquean varios segundos: EasyOCR va al pool de procesos
+        # y Tesseract (un subproceso) a un hilo, para no congelar el event loop.
         try:
-            ez_text, ez_latency = run_easyocr_single(tmp_path)
+            with pool.slot():
+                ez_text, ez_latency = await pool.run_cpu(run_easyocr_single, tmp_path)
+        except PoolSaturated as e:
+            raise HTTPException(
+                status_code=503,
+                detail="Servidor de OCR saturado. Intenta de nuevo más tarde.",
+                headers={"Retry-After": str(e.retry_after)},
+            )
         except Exception as e:
             ez_text, ez_latency = f"[Error EasyOCR: {e}]", 0.0
 
         try:
-            tess_text, tess_latency = run_tesseract_ocr(tmp_path)
+            tess_text, tess_latency = await pool.run_io(run_tesseract_ocr, tmp_path)
         except Exception as e:
             tess_text, tess_latency = f"[Error Tesseract: {e}]", 0.0
 
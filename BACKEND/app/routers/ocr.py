@@ -1,92 +1,82 @@
-from io import BytesIO
-from typing import Sequence
+import asyncio
+import os
+from typing import List
 from fastapi import APIRouter, UploadFile, File, HTTPException, Depends, Form
-from PIL import Image, ImageOps
 from sqlalchemy.orm import Session
 from ..database import get_db
-from ..models import OCRResult
-from ..schemas import OCRResponse
-from ..ocr_engine import run_ocr
+from ..jobs import job_queue, job_response
+from ..models import OCRJob
+from ..schemas import OCRBatchItem, OCRJobResponse, OCRResponse
+from ..inference import PoolSaturated, pool
+from ..pdf_processing import PDFUnsupported
+from ..preprocessing import sniff_mime
+from ..reader_registry import LanguageNotAllowed, reader_registry
+from ..ocr_service import (
+    error_row, is_handwriting, parse_langs, recognize, result_row,
+    store_error, store_result, to_response,
+)
 
 router = APIRouter(prefix="/ocr", tags=["ocr"])
 
 MAX_MB = 20
 ALLOWED = {"image/png", "image/jpeg", "image/webp", "application/pdf"}
+BATCH_MAX_FILES = int(os.getenv("OCR_BATCH_MAX_FILES", "50"))
+BATCH_MAX_MB = int(os.getenv("OCR_BATCH_MAX_MB", "100"))
+CHUNK_SIZE = 256 * 1024
 
-def _prepare_image(image_bytes: bytes) -> bytes:
+UPLOAD_LIMITS = {
+    "/ocr/batch": BATCH_MAX_MB * 1024 * 1024,
+    "/ocr": (MAX_MB + 1) * 1024 * 1024,
+}
+
+def _saturated(e: PoolSaturated) -> HTTPException:
+    return HTTPException(
+        status_code=503,
+        detail="Servidor de OCR saturado. Intenta de nuevo más tarde.",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+def _langs(lang: str) -> list[str]:
+    langs = parse_langs(lang)
     try:
-        im = Image.open(BytesIO(image_bytes)).convert("RGB")
-        im = ImageOps.exif_transpose(im)
-        w, h = im.size
-        max_side = 2000
-        if max(w, h) > max_side:
-            r = max_side / float(max(w, h))
-            im = im.resize((int(w * r), int(h * r)))
-        out = BytesIO()
-        im.save(out, format="WEBP", quality=95, method=6)
-        return out.getvalue()
-    except Exception:
-        return image_bytes
-
-async def _process_bytes(data: bytes, langs: Sequence[str], handwriting: bool) -> tuple[str, str]:
-    if len(data) == 0:
-        return "", "ninguno"
-    if data[:5] == b"%PDF-":
-        try:
-            from pdf2image import convert_from_bytes
-        except Exception as e:
-            raise HTTPException(status_code=415, detail=f"PDF no soportado ({e})")
-        pages = convert_from_bytes(data, dpi=220, fmt="jpeg")
-        parts = []
-        engines: set[str] = set()
-        for pg in pages:
-            out = BytesIO()
-            pg.save(out, format="WEBP", quality=95, method=6)
-            page_text, engine = run_ocr(out.getvalue(), langs=langs, handwriting=handwriting)
-            engines.add(engine)
-            parts.append(page_text)
-        text = "\n\n--- PAGE BREAK ---\n\n".join(p for p in parts if p.strip())
-        return text, ", ".join(sorted(engines))
-    prepared = _prepare_image(data)
-    return run_ocr(prepared, langs=langs, handwriting=handwriting)
+        reader_registry.check(langs)
+    except LanguageNotAllowed as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return langs
 
-async def _upload_core(file: UploadFile, db: Session, lang: str, mode: str, doc_type_id: int | None) -> OCRResponse:
+async def _read_upload(file: UploadFile) -> bytes:
+    limit = MAX_MB * 1024 * 1024
+    if file.size is not None and file.size > limit:
+        raise HTTPException(status_code=413, detail=f"Archivo demasiado grande (>{MAX_MB}MB)")
+
+    buf = bytearray()
+    while chunk := await file.read(CHUNK_SIZE):
+        if not buf:
+            mime = sniff_mime(chunk)
+            if mime not in ALLOWED:
+                raise HTTPException(status_code=415, detail=f"Formato no soportado: {mime or 'desconocido'}")
+        buf += chunk
+        if len(buf) > limit:
+            raise HTTPException(status_code=413, detail=f"Archivo demasiado grande (>{MAX_MB}MB)")
+    return bytes(buf)
 
-    if file.content_type not in ALLOWED:
-        raise HTTPException(status_code=415, detail=f"Formato no soportado: {file.content_type}")
-    data = await file.read()
-    if len(data) > MAX_MB * 1024 * 1024:
-        raise HTTPException(status_code=413, detail="Archivo demasiado grande (>20MB)")
+async def _upload_core(file: UploadFile, db: Session, lang: str, mode: str, doc_type_id: int | None) -> OCRResponse:
 
-    handwriting = (mode or "").strip().lower() == "handwriting"
-    langs: Sequence[str] = [s.strip() for s in (lang or "es,en").split(",") if s.strip()]
+    langs = _langs(lang)
+    data = await _read_upload(file)
+    handwriting = is_handwriting(mode)
 
     try:
-        text, engine = await _process_bytes(data, langs=langs, handwriting=handwriting)
-    except HTTPException:
-        raise
+        text, engine = await recognize(db, data, langs=langs, handwriting=handwriting, doc_type_id=doc_type_id)
+    except PoolSaturated as e:
+        raise _saturated(e)
+    except PDFUnsupported as e:
+        raise HTTPException(status_code=415, detail=f"PDF no soportado ({e})")
     except Exception as e:
-        row = OCRResult(filename=file.filename, text=None, estatus=f"Error: {e}", doc_type_id=doc_type_id)
-        db.add(row); db.commit(); db.refresh(row)
+        await store_error(db, file.filename, e, doc_type_id)
         raise HTTPException(status_code=500, detail=f"OCR falló: {e}")
 
-    row = OCRResult(
-        filename=file.filename,
-        text=text,
-        estatus="Procesado",
-        doc_type_id=doc_type_id,
-    )
-    db.add(row); db.commit(); db.refresh(row)
-
-    return OCRResponse(
-        id=row.id,
-        filename=row.filename,
-        estatus=row.estatus,
-        text=row.text or "",
-        created_at=row.created_at,
-        doc_type_id=row.doc_type_id,
-        engine=engine,
-    )
+    return await store_result(db, file.filename, text, engine, doc_type_id)
 
 @router.post("", response_model=OCRResponse, include_in_schema=False)
 async def upload_image_no_slash(
@@ -101,3 +91,69 @@ async def upload_image(
     lang: str = Form("es,en"), mode: str = Form(""), doc_type_id: int | None = Form(None),
 ):
     return await _upload_core(file, db, lang, mode, doc_type_id)
+
+@router.post("/batch", response_model=List[OCRBatchItem])
+async def upload_batch(
+    files: List[UploadFile] = File(...), db: Session = Depends(get_db),
+    lang: str = Form("es,en"), mode: str = Form(""), doc_type_id: int | None = Form(None),
+):
+    if len(files) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=413, detail=f"Demasiados archivos (máximo {BATCH_MAX_FILES})")
+
+    handwriting = is_handwriting(mode)
+    langs = _langs(lang)
+    limit = asyncio.Semaphore(pool.ocr_workers)
+
+    async def _one(file: UploadFile):
+        try:
+            data = await _read_upload(file)
+        except HTTPException as e:
+            return None, e.detail
+        async with limit:
+            try:
+                return await recognize(db, data, langs=langs, handwriting=handwriting, doc_type_id=doc_type_id), None
+            except PoolSaturated:
+                return None, "Servidor de OCR saturado"
+            except PDFUnsupported as e:
+                return None, f"PDF no soportado ({e})"
+            except Exception as e:
+                return e, f"OCR falló: {e}"
+
+    outcomes = await asyncio.gather(*(_one(f) for f in files))
+
+    rows = []
+    for file, (outcome, _) in zip(files, outcomes):
+        if isinstance(outcome, tuple):
+            rows.append(result_row(file.filename, outcome[0], doc_type_id))
+        elif isinstance(outcome, Exception):
+            rows.append(error_row(file.filename, outcome, doc_type_id))
+        else:
+            rows.append(None)
+    db.add_all(r for r in rows if r is not None)
+    db.flush()
+
+    items = []
+    for file, (outcome, error), row in zip(files, outcomes, rows):
+        if isinstance(outcome, tuple):
+            items.append(OCRBatchItem(filename=file.filename, ok=True, result=to_response(row, outcome[1])))
+        else:
+            items.append(OCRBatchItem(filename=file.filename, ok=False, error=error))
+    db.commit()
+    return items
+
+@router.post("/jobs", response_model=OCRJobResponse, status_code=202)
+async def create_job(
+    file: UploadFile = File(...), db: Session = Depends(get_db),
+    lang: str = Form("es,en"), mode: str = Form(""), doc_type_id: int | None = Form(None),
+):
+    _langs(lang)
+    data = await _read_upload(file)
+    job = job_queue.submit(data, file.filename, lang, mode, doc_type_id)
+    return job_response(db, job)
+
+@router.get("/jobs/{job_id}", response_model=OCRJobResponse)
+def get_job(job_id: str, db: Session = Depends(get_db)):
+    job = db.get(OCRJob, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Trabajo no encontrado")
+    return job_response(db, job)
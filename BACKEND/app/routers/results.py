@@ -1,30 +1,97 @@
+from datetime import datetime
 from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy.orm import Session
-from sqlalchemy import select
+from sqlalchemy import func, null, select
 from ..database import get_db
-from ..models import OCRResult
-from ..schemas import OCRResponse
+from ..models import OCRResult, OCRText
+from ..ocr_service import to_response
+from ..schemas import OCRListItem, OCRResponse, OCRSearchHit
+from ..search import search_results
+from ..text_store import unpack
 
 router = APIRouter(prefix="/results", tags=["results"])
 
-@router.get("", response_model=List[OCRResponse])
+@router.get("", response_model=List[OCRListItem])
 def list_results(
+    response: Response,
     db: Session = Depends(get_db),
     estatus: str | None = Query(None),
     limit: int = Query(100, ge=1, le=500),
+    cursor: int | None = Query(None, ge=1, description="Devuelve resultados con id menor (cabecera X-Next-Cursor)"),
+    since: datetime | None = Query(None),
+    until: datetime | None = Query(None),
+    doc_type_id: int | None = Query(None),
+    text_mode: str = Query("full", alias="text", pattern="^(full|truncate|none)$"),
+    text_chars: int = Query(200, ge=1, le=5000),
 ):
-    stmt = select(OCRResult).order_by(OCRResult.id.desc()).limit(limit)
+    if text_mode == "full":
+        text_cols = (OCRResult.inline_text, OCRText.codec, OCRText.data)
+    elif text_mode == "truncate":
+        text_cols = (func.substr(OCRResult.inline_text, 1, text_chars), OCRText.codec, OCRText.data)
+    else:
+        text_cols = (null(), null(), null())
+
+    stmt = select(
+        OCRResult.id, OCRResult.filename, OCRResult.estatus, OCRResult.created_at, OCRResult.doc_type_id,
+        text_cols[0].label("text"), text_cols[1].label("codec"), text_cols[2].label("data"),
+    ).order_by(OCRResult.id.desc()).limit(limit + 1)
+    if text_mode != "none":
+        stmt = stmt.outerjoin(OCRText, OCRText.result_id == OCRResult.id)
     if estatus:
-        stmt = stmt.filter(OCRResult.estatus == estatus)
-    return db.execute(stmt).scalars().all()
+        stmt = stmt.where(OCRResult.estatus == estatus)
+    if cursor is not None:
+        stmt = stmt.where(OCRResult.id < cursor)
+    if since is not None:
+        stmt = stmt.where(OCRResult.created_at >= since)
+    if until is not None:
+        stmt = stmt.where(OCRResult.created_at < until)
+    if doc_type_id is not None:
+        stmt = stmt.where(OCRResult.doc_type_id == doc_type_id)
+
+    rows = db.execute(stmt).all()
+    if len(rows) > limit:
+        rows = rows[:limit]
+        response.headers["X-Next-Cursor"] = str(rows[-1].id)
+    chars = text_chars if text_mode == "truncate" else None
+    return [
+        OCRListItem(
+            id=row.id,
+            filename=row.filename,
+            estatus=row.estatus,
+            text=unpack(row.codec, row.data, chars) if row.data is not None else row.text,
+            created_at=row.created_at,
+            doc_type_id=row.doc_type_id,
+        )
+        for row in rows
+    ]
+
+@router.get("/search", response_model=List[OCRSearchHit])
+def search(
+    db: Session = Depends(get_db),
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=100),
+    offset: int = Query(0, ge=0),
+):
+    return [
+        OCRSearchHit(
+            id=hit.row.id,
+            filename=hit.row.filename,
+            estatus=hit.row.estatus,
+            created_at=hit.row.created_at,
+            doc_type_id=hit.row.doc_type_id,
+            score=hit.score,
+            snippet=hit.snippet,
+        )
+        for hit in search_results(db, q, limit=limit, offset=offset)
+    ]
 
 @router.get("/{result_id}", response_model=OCRResponse)
 def get_result(result_id: int, db: Session = Depends(get_db)):
     row = db.get(OCRResult, result_id)
     if row is None:
         raise HTTPException(status_code=404, detail="Resultado no encontrado")
-    return row
+    return to_response(row, None)
 
 @router.delete("/{result_id}", status_code=204)
 def delete_result(result_id: int, db: Session = Depends(get_db)):
@@ -14,6 +14,38 @@ class OCRResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class OCRListItem(BaseModel):
+    id: int
+    filename: str
+    estatus: str
+    text: str | None = None
+    created_at: datetime
+    doc_type_id: int | None = None
+
+class OCRSearchHit(BaseModel):
+    id: int
+    filename: str
+    estatus: str
+    created_at: datetime
+    doc_type_id: int | None = None
+    score: float
+    snippet: str
+
+class OCRBatchItem(BaseModel):
+    filename: str
+    ok: bool
+    result: OCRResponse | None = None
+    error: str | None = None
+
+class OCRJobResponse(BaseModel):
+    id: str
+    status: str
+    filename: str
+    created_at: datetime
+    updated_at: datetime
+    error: str | None = None
+    result: OCRResponse | None = None
+
 class RenewResponse(BaseModel):
     result_id: int
     doc_type_id: int | None = None
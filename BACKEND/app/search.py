@@ -0,0 +1,95 @@
+from __future__ import annotations
+
+import re
+import unicodedata
+from dataclasses import dataclass
+
+from sqlalchemy import and_, or_, select, text
+from sqlalchemy.orm import Session
+
+from . import database
+from .models import OCRResult
+
+SNIPPET_TOKENS = 12
+SNIPPET_CHARS = 160
+HIGHLIGHT = ("<b>", "</b>")
+
+_WORD = re.compile(r"\w+", re.UNICODE)
+
+@dataclass
+class SearchHit:
+    row: OCRResult
+    score: float
+    snippet: str
+
+def terms(q: str) -> list[str]:
+    return _WORD.findall(q or "")
+
+def fts_query(words: list[str]) -> str:
+    return " ".join(f'"{w}"*' for w in words)
+
+def _fold(s: str) -> str:
+    return "".join(c for c in unicodedata.normalize("NFD", s.lower()) if unicodedata.category(c) != "Mn")
+
+def _snippet(body: str | None, words: list[str]) -> str:
+    body = body or ""
+    folded = _fold(body)
+    pos = min((p for p in (folded.find(_fold(w)) for w in words) if p >= 0), default=0)
+    start = max(0, pos - SNIPPET_CHARS // 3)
+    out = body[start:start + SNIPPET_CHARS].replace("\n", " ")
+    return ("…" if start else "") + out + ("…" if start + SNIPPET_CHARS < len(body) else "")
+
+def _search_fts(db: Session, words: list[str], limit: int, offset: int) -> list[SearchHit]:
+    table = database.FTS_TABLE
+    rows = db.execute(
+        text(
+            f"SELECT rowid, bm25({table}, 2.0, 1.0) AS score,"
+            f" snippet({table}, -1, :open, :close, '…', :tokens) AS snip"
+            f" FROM {table} WHERE {table} MATCH :q ORDER BY score LIMIT :limit OFFSET :offset"
+        ),
+        {
+            "q": fts_query(words), "open": HIGHLIGHT[0], "close": HIGHLIGHT[1],
+            "tokens": SNIPPET_TOKENS, "limit": limit, "offset": offset,
+        },
+    ).all()
+    found = {r.id: r for r in db.execute(
+        select(OCRResult).where(OCRResult.id.in_([r.rowid for r in rows]))
+    ).scalars()}
+    return [
+        SearchHit(found[r.rowid], round(-r.score, 4), r.snip)
+        for r in rows if r.rowid in found
+    ]
+
+def _search_like(db: Session, words: list[str], limit: int, offset: int) -> list[SearchHit]:
+    # Solo ve los textos en línea: los comprimidos en ocr_texts requieren FTS5.
+    conds = [
+        or_(OCRResult.inline_text.ilike(f"%{w}%"), OCRResult.filename.ilike(f"%{w}%"))
+        for w in words
+    ]
+    rows = db.execute(
+        select(OCRResult).where(and_(*conds)).order_by(OCRResult.id.desc()).limit(limit).offset(offset)
+    ).scalars().all()
+    return [SearchHit(r, 0.0, _snippet(r.text, words)) for r in rows]
+
+def search_results(db: Session, q: str, limit: int = 20, offset: int = 0) -> list[SearchHit]:
+    words = terms(q)
+    if not words:
+        return []
+    if database.HAS_FTS:
+        return _search_fts(db, words, limit, offset)
+    return _search_like(db, words, limit, offset)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Índice de texto completo de los resultados OCR")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Reconstruye el índice tras escribir ocr_results con otras herramientas")
+    args = parser.parse_args()
+    if args.rebuild:
+        database.run_migrations()
+        if database.HAS_FTS:
+            database.rebuild_fts()
+            print(f"Índice {database.FTS_TABLE} reconstruido")
+        else:
+            print("FTS5 no disponible en esta base")
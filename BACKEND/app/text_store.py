@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+import os
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from .database import IS_SQLITE
+
+# En PostgreSQL el TOAST ya comprime y saca de la fila los textos grandes.
+OCR_TEXT_INLINE_MAX = int(os.getenv("OCR_TEXT_INLINE_MAX", "4096" if IS_SQLITE else "0"))
+OCR_TEXT_CODEC      = os.getenv("OCR_TEXT_CODEC", "zstd" if zstandard else "zlib").strip().lower()
+OCR_TEXT_LEVEL      = int(os.getenv("OCR_TEXT_LEVEL", "6"))
+
+CODECS = ("zlib", "zstd")
+
+if OCR_TEXT_CODEC not in CODECS:
+    raise ValueError(f"OCR_TEXT_CODEC inválido: {OCR_TEXT_CODEC}")
+if OCR_TEXT_CODEC == "zstd" and zstandard is None:
+    raise ValueError("OCR_TEXT_CODEC=zstd requiere el paquete zstandard")
+
+def should_pack(text: str | None) -> bool:
+    return text is not None and OCR_TEXT_INLINE_MAX > 0 and len(text) > OCR_TEXT_INLINE_MAX
+
+def pack(text: str, codec: str = OCR_TEXT_CODEC) -> bytes:
+    raw = text.encode("utf-8")
+    if codec == "zstd":
+        return zstandard.ZstdCompressor(level=OCR_TEXT_LEVEL).compress(raw)
+    return zlib.compress(raw, OCR_TEXT_LEVEL)
+
+def unpack(codec: str, data: bytes, chars: int | None = None) -> str:
+    # Con `chars` solo se descomprime el prefijo necesario (4 bytes por carácter en el peor caso).
+    limit = chars * 4 if chars is not None else None
+    if codec == "zstd":
+        if zstandard is None:
+            raise RuntimeError("Texto comprimido con zstd pero el paquete zstandard no está instalado")
+        dctx = zstandard.ZstdDecompressor()
+        raw = dctx.stream_reader(data).read(limit) if limit is not None else dctx.decompress(data)
+    elif limit is not None:
+        raw = zlib.decompressobj().decompress(data, limit)
+    else:
+        raw = zlib.decompress(data)
+    text = raw.decode("utf-8", errors="ignore" if limit is not None else "strict")
+    return text[:chars] if chars is not None else text
@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+import json
+import logging
+import os
+from pathlib import Path
+
+logger = logging.getLogger("ocr.threads")
+
+OCR_TORCH_THREADS         = int(os.getenv("OCR_TORCH_THREADS", "0"))
+OCR_TORCH_INTEROP_THREADS = int(os.getenv("OCR_TORCH_INTEROP_THREADS", "0"))
+WEB_CONCURRENCY           = int(os.getenv("WEB_CONCURRENCY", "1"))
+OCR_THREADS_CONFIG        = Path(os.getenv(
+    "OCR_THREADS_CONFIG", str(Path(__file__).resolve().parent / "torch_threads.json")
+))
+
+def cpu_count() -> int:
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+def total_processes(workers: int, api_processes: int = WEB_CONCURRENCY) -> int:
+    # Cada proceso de la API (worker de gunicorn) crea su propio pool de OCR.
+    return max(1, workers) * max(1, api_processes)
+
+def load_config(path: Path = OCR_THREADS_CONFIG) -> dict:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning("No se pudo leer %s: %s", path, e)
+        return {}
+
+def save_config(config: dict, path: Path = OCR_THREADS_CONFIG) -> None:
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(config, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+def _from_config(config: dict, workers: int) -> dict | None:
+    if config.get("cpu_count") not in (None, cpu_count()):
+        logger.warning("%s se generó para %s CPUs; se ignora", OCR_THREADS_CONFIG.name, config.get("cpu_count"))
+        return None
+    by_workers = {int(k): v for k, v in (config.get("by_workers") or {}).items()}
+    fitting = [n for n in by_workers if n <= workers]
+    if not fitting:
+        return None
+    return by_workers[max(fitting)]
+
+def resolve(workers: int) -> dict:
+    total = total_processes(workers)
+    intra = max(1, cpu_count() // total)
+    inter = 1
+    source = "auto"
+
+    tuned = _from_config(load_config(), total)
+    if tuned:
+        intra, inter = int(tuned["intra_op"]), int(tuned["inter_op"])
+        source = "config"
+    if OCR_TORCH_THREADS > 0:
+        intra, source = OCR_TORCH_THREADS, "env"
+    if OCR_TORCH_INTEROP_THREADS > 0:
+        inter, source = OCR_TORCH_INTEROP_THREADS, "env"
+    return {"intra_op": intra, "inter_op": inter, "source": source}
+
+def apply(intra_op: int, inter_op: int) -> None:
+    import torch
+
+    os.environ["OMP_NUM_THREADS"] = str(intra_op)
+    torch.set_num_threads(intra_op)
+    if torch.get_num_interop_threads() == inter_op:
+        return
+    try:
+        torch.set_num_interop_threads(inter_op)
+    except RuntimeError as e:
+        logger.warning("No se pudo fijar inter-op threads=%d: %s", inter_op, e)
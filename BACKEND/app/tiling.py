@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import os
+from typing import Sequence
+
+import numpy as np
+
+from .preprocessing import MAX_SIDE
+
+OCR_TILING        = os.getenv("OCR_TILING", "0").strip() in {"1", "true", "yes"}
+OCR_TILE_SIZE     = int(os.getenv("OCR_TILE_SIZE", "1280"))
+OCR_TILE_OVERLAP  = int(os.getenv("OCR_TILE_OVERLAP", "160"))
+OCR_TILE_MAX_SIDE = int(os.getenv("OCR_TILE_MAX_SIDE", "8000"))
+OCR_TILE_THREADS  = int(os.getenv("OCR_TILE_THREADS", "2"))
+
+DECODE_MAX_SIDE = OCR_TILE_MAX_SIDE if OCR_TILING else MAX_SIDE
+
+Tile = tuple[int, int, int, int]
+
+def needs_tiling(image) -> bool:
+    return OCR_TILING and isinstance(image, np.ndarray) and max(image.shape[:2]) > MAX_SIDE
+
+def _origins(length: int, size: int, overlap: int) -> list[int]:
+    if length <= size:
+        return [0]
+    step = max(1, size - overlap)
+    return list(range(0, length - size, step)) + [length - size]
+
+def _spans(length: int, size: int, overlap: int) -> list[tuple[int, int, int, int]]:
+    origins = _origins(length, size, overlap)
+    ends = [min(length, o + size) for o in origins]
+    cuts = [0] + [(o + prev_end) // 2 for o, prev_end in zip(origins[1:], ends)] + [length]
+    return [(o, e, cuts[i], cuts[i + 1]) for i, (o, e) in enumerate(zip(origins, ends))]
+
+def tiles(
+    height: int, width: int, size: int = OCR_TILE_SIZE, overlap: int = OCR_TILE_OVERLAP,
+) -> list[tuple[Tile, Tile]]:
+    return [
+        ((x0, y0, x1, y1), (cx0, cy0, cx1, cy1))
+        for y0, y1, cy0, cy1 in _spans(height, size, overlap)
+        for x0, x1, cx0, cx1 in _spans(width, size, overlap)
+    ]
+
+def _inside(cx: float, cy: float, core: Tile) -> bool:
+    return core[0] <= cx < core[2] and core[1] <= cy < core[3]
+
+def _same_line(a: list[int], b: list[int], gap: int) -> bool:
+    overlap_y = min(a[3], b[3]) - max(a[2], b[2])
+    min_h = min(a[3] - a[2], b[3] - b[2])
+    return min_h > 0 and overlap_y >= 0.5 * min_h and max(a[0], b[0]) <= min(a[1], b[1]) + gap
+
+def merge_horizontal(boxes: list[list[int]], gap: int = 0) -> list[list[int]]:
+    merged: list[list[int]] = []
+    for box in sorted(boxes, key=lambda b: (b[2], b[0])):
+        for m in merged:
+            if _same_line(m, box, gap):
+                m[0], m[1] = min(m[0], box[0]), max(m[1], box[1])
+                m[2], m[3] = min(m[2], box[2]), max(m[3], box[3])
+                break
+        else:
+            merged.append(list(box))
+    return merged
+
+def stitch(
+    detections: Sequence[tuple[list, list]],
+    layout: Sequence[tuple[Tile, Tile]],
+    width: int,
+) -> tuple[list[list[int]], list[list[list[int]]]]:
+    horizontal: list[list[int]] = []
+    free: list[list[list[int]]] = []
+    for (h_boxes, f_boxes), (tile, core) in zip(detections, layout):
+        x0, y0, x1, _ = tile
+        for b in h_boxes:
+            box = [int(b[0]) + x0, int(b[1]) + x0, int(b[2]) + y0, int(b[3]) + y0]
+            touches_seam = (box[0] <= x0 and x0 > 0) or (box[1] >= x1 and x1 < width)
+            if touches_seam or _inside((box[0] + box[1]) / 2, (box[2] + box[3]) / 2, core):
+                horizontal.append(box)
+        for pts in f_boxes:
+            shifted = [[int(p[0]) + x0, int(p[1]) + y0] for p in pts]
+            cx = sum(p[0] for p in shifted) / len(shifted)
+            cy = sum(p[1] for p in shifted) / len(shifted)
+            if _inside(cx, cy, core):
+                free.append(shifted)
+    return merge_horizontal(horizontal), free
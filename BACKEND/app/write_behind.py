@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+from typing import Callable
+
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+
+logger = logging.getLogger("ocr.db")
+
+DB_WRITE_BEHIND  = os.getenv("DB_WRITE_BEHIND", "0").strip() in {"1", "true", "yes"}
+DB_WRITE_BATCH   = int(os.getenv("DB_WRITE_BATCH", "64"))
+DB_WRITE_WAIT_MS = float(os.getenv("DB_WRITE_WAIT_MS", "5"))
+
+class WriteBehind:
+
+    def __init__(
+        self,
+        session_factory: Callable[..., Session] = SessionLocal,
+        enabled: bool = DB_WRITE_BEHIND,
+        max_batch: int = DB_WRITE_BATCH,
+        max_wait_ms: float = DB_WRITE_WAIT_MS,
+    ):
+        self.session_factory = session_factory
+        self.enabled         = enabled
+        self.max_batch       = max(1, max_batch)
+        self.max_wait_s      = max(0.0, max_wait_ms) / 1000.0
+
+        self._pending: list[tuple[object, asyncio.Future]] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._tasks: set[asyncio.Task] = set()
+        self._commit_lock: asyncio.Lock | None = None
+        self._commits = 0
+        self._rows = 0
+
+    async def add(self, row):
+        loop = asyncio.get_running_loop()
+        fut: asyncio.Future = loop.create_future()
+        self._pending.append((row, fut))
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.max_wait_s, self._flush)
+        return await fut
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._commit(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    def _write(self, rows: list) -> None:
+        with self.session_factory(expire_on_commit=False) as db:
+            db.add_all(rows)
+            db.commit()
+
+    async def _commit(self, batch: list[tuple[object, asyncio.Future]]) -> None:
+        if self._commit_lock is None:
+            self._commit_lock = asyncio.Lock()
+        rows = [row for row, _ in batch]
+        async with self._commit_lock:
+            try:
+                await asyncio.to_thread(self._write, rows)
+            except Exception as e:
+                logger.error("Falló la escritura agrupada de %d filas: %s", len(rows), e)
+                for _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+                return
+        self._commits += 1
+        self._rows += len(rows)
+        for row, fut in batch:
+            if not fut.done():
+                fut.set_result(row)
+
+    async def drain(self) -> None:
+        self._flush()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "enabled":     self.enabled,
+            "max_batch":   self.max_batch,
+            "max_wait_ms": round(self.max_wait_s * 1000.0, 1),
+            "commits":     self._commits,
+            "mean_batch":  round(self._rows / self._commits, 2) if self._commits else 0.0,
+        }
+
+write_behind = WriteBehind()
@@ -0,0 +1,20 @@
+import os
+
+bind         = os.getenv("BIND", "0.0.0.0:8000")
+workers      = int(os.getenv("WEB_CONCURRENCY", "2"))
+# Los workers heredan el valor efectivo: thread_config reparte las CPUs entre
+# WEB_CONCURRENCY x OCR_WORKERS procesos.
+os.environ["WEB_CONCURRENCY"] = str(workers)
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app  = True
+timeout      = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+
+def on_starting(server):
+    from app.ocr_engine import preload_readers
+    loaded = preload_readers()
+    server.log.info("Modelos EasyOCR precargados en el master: %s", loaded)
+
+def post_fork(server, worker):
+    # Cada worker abre sus propias conexiones; las heredadas del master no se tocan.
+    from app.database import engine
+    engine.dispose(close=False)
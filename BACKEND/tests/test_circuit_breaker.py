@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from app.circuit_breaker import CLOSED, HALF_OPEN, CircuitBreaker
+
+def _half_open() -> CircuitBreaker:
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.state == HALF_OPEN
+    return breaker
+
+def test_released_probe_allows_a_new_probe():
+    breaker = _half_open()
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.release_probe()
+    assert breaker.allow()
+
+def test_cancelled_groq_probe_does_not_wedge_breaker(monkeypatch):
+    inference = pytest.importorskip("app.inference", exc_type=ImportError)
+    breaker = _half_open()
+    calls = []
+
+    async def transcribe(image, max_retries=4):
+        calls.append(max_retries)
+        if len(calls) == 1:
+            await asyncio.sleep(10)
+        return "texto"
+
+    monkeypatch.setattr(inference, "groq_breaker", breaker)
+    monkeypatch.setattr(inference.groq_client, "transcribe", transcribe)
+    pool = inference.InferencePool(ocr_workers=1, io_workers=1)
+
+    async def run():
+        probe = asyncio.ensure_future(pool.groq(b"img"))
+        await asyncio.sleep(0)
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        return await pool.groq(b"img")
+
+    assert asyncio.run(run()) == "texto"
+    assert calls == [1, 1]
+    assert breaker.state == CLOSED
@@ -0,0 +1,81 @@
+import asyncio
+import io
+
+import httpx
+import pytest
+from PIL import Image
+
+pytest.importorskip("cv2")
+
+from app.groq_client import GroqError, GroqVisionClient
+from app.rate_governor import TokenBucketGovernor
+
+def _image() -> bytes:
+    buf = io.BytesIO()
+    Image.new("RGB", (32, 16), "white").save(buf, "PNG")
+    return buf.getvalue()
+
+def _client(handler) -> GroqVisionClient:
+    governor = TokenBucketGovernor(requests_per_minute=0, tokens_per_minute=0)
+    return GroqVisionClient(
+        api_key="test", base_url="https://groq.test/v1", governor=governor,
+        transport=httpx.MockTransport(handler),
+    )
+
+def _ok(text: str) -> httpx.Response:
+    return httpx.Response(200, json={
+        "choices": [{"message": {"content": f" {text}\n"}}],
+        "usage": {"total_tokens": 900},
+    })
+
+def test_retries_after_429_honouring_retry_after(monkeypatch):
+    requests = []
+    sleeps = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        if len(requests) == 1:
+            return httpx.Response(429, headers={"Retry-After": "7"})
+        return _ok("hola mundo")
+
+    real_sleep = asyncio.sleep
+
+    async def sleep(delay, *args, **kwargs):
+        sleeps.append(delay)
+        await real_sleep(0)
+
+    monkeypatch.setattr("app.groq_client.asyncio.sleep", sleep)
+    client = _client(handler)
+
+    async def run():
+        try:
+            return await client.transcribe_timed(_image())
+        finally:
+            await client.aclose()
+
+    text, http_ms = asyncio.run(run())
+    assert text == "hola mundo"
+    assert http_ms >= 0.0
+    assert len(requests) == 2
+    assert sleeps == [7.0]
+    assert requests[0].url.path == "/v1/chat/completions"
+    assert requests[0].headers["Authorization"] == "Bearer test"
+
+def test_other_errors_are_not_retried():
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(500, text="boom")
+
+    client = _client(handler)
+
+    async def run():
+        try:
+            return await client.transcribe(_image(), max_retries=3)
+        finally:
+            await client.aclose()
+
+    with pytest.raises(GroqError, match="500"):
+        asyncio.run(run())
+    assert len(calls) == 1